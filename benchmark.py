@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"Times the engine's hot paths and compares them against a saved baseline."
+
+if __name__ == '__main__':
+	import os
+	import sys
+	import argparse
+	# Nothing is shown or played, so don't bother opening a window or an audio device.
+	# The rendering benchmarks draw on the dummy driver's surface instead.
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	import engine.benchmarks as benchmarks
+	# Parse the optional arguments for the command line interface.
+	parser = argparse.ArgumentParser(description="pyTetris engine benchmarks.")
+	parser.add_argument('names', nargs='*', help="only run benchmarks whose names contain one of these")
+	parser.add_argument('-r', '--repeat', type=int, default=5, help="number of times to run each benchmark")
+	parser.add_argument('-s', '--seed', type=int, default=0, help="random seed for the fixtures")
+	parser.add_argument('-q', '--quick', action='store_true', help="run a tenth as many operations per benchmark")
+	parser.add_argument('-o', '--output', metavar='FILE', default=None, help="save the results as JSON")
+	parser.add_argument('-b', '--baseline', metavar='FILE', default=None, help="compare the results against saved ones")
+	parser.add_argument('-t', '--tolerance', type=float, default=0.2, help="how much slower than the baseline counts as a regression")
+	args = parser.parse_args()
+
+	results = benchmarks.run(args.names, args.repeat, args.seed, 0.1 if args.quick else 1.)
+	print("{:<24} {:>12} {:>12} {:>8}".format('benchmark', 'best (us)', 'median (us)', 'ops'))
+	for name, result in results.items():
+		print("{:<24} {:>12.3f} {:>12.3f} {:>8}".format(name, result['best'], result['median'], result['ops']))
+	if args.output is not None:
+		benchmarks.save(args.output, results, args.seed)
+		print("Results saved to " + args.output)
+	if args.baseline is not None:
+		regressions = 0
+		print("\nCompared against " + args.baseline + ":")
+		for name, base, result, ratio, regressed in benchmarks.compare(results, benchmarks.load(args.baseline), args.tolerance):
+			print("{:<24} {:>12.3f} {:>12.3f} {:>7.2f}x{}".format(name, base, result, ratio, '  REGRESSION' if regressed else ''))
+			regressions += regressed
+		# Fail if anything got slower, so this can gate changes.
+		if regressions:
+			print("{} benchmark(s) regressed by more than {:.0%}.".format(regressions, args.tolerance))
+			sys.exit(1)
@@ -0,0 +1,485 @@
+"Times the engine's hot paths and the drawing of every screen on seeded fixtures, so changes that slow them down get caught."
+try:
+	import time
+	import json
+	import random
+	import platform
+	import pygame as pg
+	import engine.environment as env
+	import engine.menu as menu
+	import engine.kicks as kicks
+	import engine.placements as placements
+	import engine.features as features
+	from engine.game import Core
+	from engine.shapes import Shape, Grid
+	from engine.userstate import User
+	from engine.headless import Simulation
+	from engine.transpositions import TranspositionTable
+except ImportError:
+	print("The stopwatch broke before the race started:")
+	raise
+
+def snapshot (grid):
+	# The visible settled blocks of a grid as (row, column, color, linkmask) tuples, to build it again from.
+	return tuple(
+		(i, j, block.color, block.linkmask)
+		for i, row in enumerate(grid[:22]) for j, block in enumerate(row) if block is not None
+	)
+
+def restore (grid, cells):
+	# Empty the grid, then fill it back in from a snapshot.
+	grid.set_cells()
+	grid.csprts = [ ]
+	for i, j, color, linkmask in cells:
+		grid.place(i, j, grid.new_block([j, i], color, linkmask))
+
+def drop_pieces (grid, rng, top):
+	# Drop random tetriminos straight down wherever they fit, until nothing more fits below the given row.
+	# Full rows are left in, so the fixtures clear lines the moment they're asked to.
+	shape = Shape()
+	misses = 0
+	while misses < 50:
+		shape.set_form(rng.randrange(7), rng.randrange(4), [rng.randrange(-1, 10), 1])
+		if grid.collides(shape.orientation.rowmasks, *shape.pos):
+			misses += 1
+			continue
+		shape.translate(( 0, grid.drop_distance(shape.orientation, *shape.pos)))
+		if min(pos[1] for pos in shape.poslist) < top:
+			misses += 1
+			continue
+		grid.paste_shape(shape)
+		misses = 0
+
+def random_stack (grid, rng, top=10):
+	# A stack of dropped tetriminos up to the given row, with every full row taken out.
+	drop_pieces(grid, rng, top)
+	full = [i for i in range(22) if grid.fills[i] == 10]
+	if full:
+		grid.compact_rows(full)
+
+def clear_fixture (grid, rng, top, rows):
+	# A stack of dropped tetriminos with the holes in its bottom rows filled in, so they all clear at once.
+	# Whatever is above them then has room to fall, which is what sets off cascades.
+	drop_pieces(grid, rng, top)
+	for i in range(22 - rows, 22):
+		for j in range(10):
+			if grid[i][j] is None:
+				grid.place(i, j, grid.new_block([j, i], rng.randrange(7)))
+	return snapshot(grid)
+
+# A stack that sets off a chain of eleven sticky cascades, clearing ten rows one after another,
+# found by searching random stacks for the longest chain. Rows 2 to 21, with a # for every block.
+tall_cascade = (
+	'..........',
+	'..........',
+	'##.##...#.',
+	'#..#..#...',
+	'..#.#.#...',
+	'#....###.#',
+	'##.#######',
+	'.##.#..###',
+	'####.#.###',
+	'..#####.#.',
+	'....#.#...',
+	'.#.#.#..#.',
+	'##.#.##.##',
+	'####...#.#',
+	'....#..##.',
+	'###.#.#...',
+	'######.#.#',
+	'#.#..#.###',
+	'.#######.#',
+	'##########',
+)
+
+def map_fixture (rows):
+	# A snapshot from a map of the bottom rows of the grid, top to bottom, with a # for every block.
+	return tuple(
+		(i, j, (i + j) % 7, 0)
+		for i, row in enumerate(rows, 22 - len(rows)) for j, cell in enumerate(row) if cell == '#'
+	)
+
+def piece_shapes (rng, count):
+	# Tetriminos of every form and state, scattered around the grid.
+	return [Shape(rng.randrange(7), rng.randrange(4), [rng.randrange(0, 8), rng.randrange(1, 20)]) for n in range(count)]
+
+def stacked_sim (rng, cleartype=2):
+	# A simulation with a random stack to test pieces against.
+	sim = Simulation()
+	sim.user.cleartype = cleartype
+	random_stack(sim.grid, rng)
+	return sim
+
+# Every benchmark takes a seeded random number generator and a number of operations to run.
+# It builds its own fixtures, then returns how long the operations took, leaving out the setup.
+
+def bench_check_collision (rng, number):
+	# Core.check_collision() against a random stack, hitting and missing.
+	sim = stacked_sim(rng)
+	shapes = piece_shapes(rng, 256)
+	check = sim.check_collision
+	loops = number // len(shapes)
+	start = time.perf_counter()
+	for n in range(loops):
+		for shape in shapes:
+			check(shape)
+	return time.perf_counter() - start, loops * len(shapes)
+
+def bench_eval_ghost (rng, number):
+	# Core.eval_ghost() for pieces all over a random stack, with its cache cleared every time.
+	sim = stacked_sim(rng)
+	shapes = [shape for shape in piece_shapes(rng, 512) if not sim.check_collision(shape)][:256]
+	freeshape = sim.freeshape
+	loops = number // len(shapes)
+	start = time.perf_counter()
+	for n in range(loops):
+		for shape in shapes:
+			sim.freeshape = shape
+			sim.ghostkey = None
+			sim.eval_ghost()
+	elapsed = time.perf_counter() - start
+	sim.freeshape = freeshape
+	return elapsed, loops * len(shapes)
+
+def bench_rotate (rng, number):
+	# Shape.rotate() both ways, for every form.
+	shapes = piece_shapes(rng, 256)
+	loops = number // (len(shapes) * 2)
+	start = time.perf_counter()
+	for n in range(loops):
+		for shape in shapes:
+			shape.rotate(True)
+			shape.rotate(False)
+	return time.perf_counter() - start, loops * len(shapes) * 2
+
+def bench_wall_kick (rng, number):
+	# Core.wall_kick() on rotations that are obstructed, so the kick table has to be searched.
+	# Setting the piece back up before each kick is timed along with it.
+	sim = stacked_sim(rng)
+	kicked = [ ]
+	test = Shape()
+	while len(kicked) < 256:
+		shape = piece_shapes(rng, 1)[0]
+		if shape.form == 1 or sim.check_collision(shape):
+			continue
+		clockwise = rng.random() < 0.5
+		test.set_form(shape.form, shape.state, shape.pos)
+		test.rotate(clockwise)
+		if sim.check_collision(test):
+			kicked.append((shape.form, shape.state, shape.pos, clockwise))
+	loops = number // len(kicked)
+	start = time.perf_counter()
+	for n in range(loops):
+		for form, state, pos, clockwise in kicked:
+			sim.floor_kick = True
+			sim.freeshape.set_form(form, state, pos)
+			sim.newshape.set_form(form, state, pos)
+			sim.newshape.rotate(clockwise)
+			sim.wall_kick()
+	return time.perf_counter() - start, loops * len(kicked)
+
+def holey_boards (rng, count):
+	# Boards of random stacks with holes dug under them, so there are tucks and spins to find.
+	boards = [ ]
+	for n in range(count):
+		sim = stacked_sim(rng)
+		for hole in range(rng.randrange(16)):
+			row, col = rng.randrange(10, 22), rng.randrange(10)
+			if sim.grid[row][col] is not None:
+				sim.grid.remove(row, col)
+		boards.append(placements.Board.from_grid(sim.grid))
+	return boards
+
+def bench_find_placements (rng, number):
+	# placements.find_placements() for every form on holey boards.
+	boards = holey_boards(rng, 16)
+	table = kicks.tables['arika']
+	loops = number // (len(boards) * 7)
+	start = time.perf_counter()
+	for n in range(loops):
+		for board in boards:
+			for form in range(7):
+				placements.find_placements(board, form, table)
+	return time.perf_counter() - start, loops * len(boards) * 7
+
+def bench_cached_placements (rng, number):
+	# placements.cached_placements() for every form on holey boards, through a transposition table
+	# that only holds half of them. Boards come up at random, so there are hits, misses and evictions.
+	boards = holey_boards(rng, 32)
+	table = kicks.tables['arika']
+	cache = TranspositionTable(sum(len(placements.find_placements(board, form, table)) + 1 for board in boards[:16] for form in range(7)))
+	lookups = [(rng.choice(boards), rng.randrange(7)) for n in range(number)]
+	start = time.perf_counter()
+	for board, form in lookups:
+		placements.cached_placements(cache, board, form, table)
+	return time.perf_counter() - start, number
+
+def bench_features_scalar (rng, number):
+	# features.reference() on holey boards, one at a time.
+	packed = [board.get_rows() for board in holey_boards(rng, 64)]
+	loops = number // len(packed)
+	start = time.perf_counter()
+	for n in range(loops):
+		for rows in packed:
+			features.reference(rows)
+	return time.perf_counter() - start, loops * len(packed)
+
+def bench_features_batch (rng, number):
+	# features.extract() on a batch of holey boards, timed per board, checked against the reference first.
+	packed = features.from_boards(holey_boards(rng, 64) * 4)
+	mismatched = features.check(packed)
+	assert not mismatched, "Batch features don't match the reference for boards {}".format(mismatched)
+	loops = max(number // len(packed), 1)
+	start = time.perf_counter()
+	for n in range(loops):
+		features.extract(packed)
+	return time.perf_counter() - start, loops * len(packed)
+
+def run_clears (grid, fixtures, number):
+	# Time Grid.clear_lines() on each fixture in turn, run all the way through like Core.eval_clears() would.
+	# Building the fixture again before every clear isn't timed.
+	elapsed = 0.
+	for n in range(number):
+		# Clearing keeps adding to the combo, so start every clear from a fresh score.
+		grid.user.reset()
+		restore(grid, fixtures[n % len(fixtures)])
+		start = time.perf_counter()
+		clearer = grid.clear_lines()
+		while next(clearer):
+			pass
+		elapsed += time.perf_counter() - start
+	return elapsed, number
+
+def clear_bench (cleartype):
+	# Grid.clear_lines() in the given clear type, clearing up to four rows under a random stack.
+	def bench (rng, number):
+		user = User()
+		user.cleartype = cleartype
+		grid = Grid(user)
+		fixtures = [ ]
+		for n in range(16):
+			grid.set_cells()
+			fixtures.append(clear_fixture(grid, rng, 8, 1 + n % 4))
+		return run_clears(grid, fixtures, number)
+	return bench
+
+def bench_tall_cascade (rng, number):
+	# Grid.clear_lines() in sticky mode on the tallest chain of cascades there is a fixture for.
+	user = User()
+	user.cleartype = 1
+	grid = Grid(user)
+	return run_clears(grid, [map_fixture(tall_cascade)], number)
+
+def bench_add_garbage (rng, number):
+	# Grid.add_garbage() under a random stack, starting over from it every 20 rows.
+	user = User()
+	grid = Grid(user)
+	grid.rng = rng
+	random_stack(grid, rng)
+	cells = snapshot(grid)
+	elapsed = 0.
+	for n in range(0, number, 20):
+		restore(grid, cells)
+		start = time.perf_counter()
+		for m in range(20):
+			grid.add_garbage()
+		elapsed += time.perf_counter() - start
+	return elapsed, (number + 19) // 20 * 20
+
+# The rendering benchmarks time single frames, flip included, with nothing holding them to the framerate.
+# They're meant to be run with the dummy video driver, so they measure the drawing and not the display.
+
+def render_core ():
+	# A game with a piece in play, ready to be drawn.
+	user = User()
+	user.state = 'game'
+	core = Core(user, menu.PauseMenu(user), menu.SaveMenu(user), menu.LossMenu(user))
+	core.entry_flag = True
+	core.next_shape()
+	return core
+
+def stack_setup (core, rng):
+	# A stack of dropped tetriminos right up to the top of the visible grid.
+	random_stack(core.grid, rng, 3)
+	core.eval_ghost()
+
+def clear_setup (core, rng):
+	# Four rows just starting to be cleared under a random stack, the clear animation part of the way through.
+	clear_fixture(core.grid, rng, 8, 4)
+	core.clearing = True
+	core.line_clearer = core.grid.clear_lines()
+	core.clearing = next(core.line_clearer)
+	for n in range(3):
+		core.grid.animate_clears()
+
+def fall_setup (core, rng):
+	# The tall cascade fixture partway through a fall, with the falling blocks drawn above where they'll land.
+	core.user.cleartype = 1
+	restore(core.grid, map_fixture(tall_cascade))
+	core.clearing = True
+	core.line_clearer = core.grid.clear_lines()
+	while not core.grid.falls:
+		core.clearing = next(core.line_clearer)
+	core.grid.csprts = [ ]
+
+def render_bench (setup=None, stale=False):
+	# Full frames of the game screen, in whatever state setup() puts the game in.
+	# If stale, the stack is drawn from scratch every frame too, rather than coming from its cache.
+	def bench (rng, number):
+		core = render_core()
+		if setup is not None:
+			setup(core, rng)
+		elapsed = 0.
+		for n in range(number):
+			core.redraw = True
+			if stale:
+				core.grid.stale_rows = set(range(2, 22))
+			start = time.perf_counter()
+			core.draw()
+			elapsed += time.perf_counter() - start
+		return elapsed, number
+	return bench
+
+def bench_render_moving (rng, number):
+	# Frames of the game screen over a full stack while the piece shifts back and forth, only drawing what changed.
+	core = render_core()
+	stack_setup(core, rng)
+	core.draw()
+	elapsed = 0.
+	for n in range(number):
+		step = 1 if n % 2 else -1
+		core.freeshape.translate((step, 0))
+		core.newshape.translate((step, 0))
+		core.eval_ghost()
+		start = time.perf_counter()
+		core.draw()
+		elapsed += time.perf_counter() - start
+	return elapsed, number
+
+def score_menu (user, rng):
+	# The high score menu, with made up scores so the score file doesn't have to be read.
+	scores = menu.HiScoreMenu(user)
+	scores.scorelist = [
+		[['Pajitnov', rng.randrange(1000000), rng.randrange(1000), rng.randrange(360000)] for i in range(10)]
+		for g in range(3)
+	]
+	return scores
+
+def main_menu (user, rng):
+	return menu.MainMenu(user, score_menu(user, rng))
+
+def play_menu (user, rng):
+	return menu.PlayMenu(user)
+
+def pause_menu (user, rng):
+	# The pause menu over a game screen.
+	pause = menu.PauseMenu(user)
+	pause.set_bg(env.screen)
+	return pause
+
+def save_menu (user, rng):
+	# The high score entry menu over a game screen, with a name partly typed in.
+	save = menu.SaveMenu(user)
+	save.loss_bg.blit(env.screen, (0, 0))
+	save.render_place(rng.randrange(10))
+	save.name = 'Pajit'
+	user.score = rng.randrange(1000000)
+	return save
+
+def loss_menu (user, rng):
+	# The game over menu over a game screen.
+	loss = menu.LossMenu(user)
+	user.score = rng.randrange(1000000)
+	loss.render_loss(env.screen)
+	return loss
+
+def menu_bench (make):
+	# Frames of the menu that make() builds, with no input coming in.
+	def bench (rng, number):
+		user = User()
+		render_core().draw()
+		shown = make(user, rng)
+		elapsed = 0.
+		for n in range(number):
+			pg.event.clear()
+			start = time.perf_counter()
+			shown.run()
+			elapsed += time.perf_counter() - start
+		return elapsed, number
+	return bench
+
+# Name, function and number of operations per run of every benchmark, in the order they're run.
+cases = (
+	('check_collision', bench_check_collision, 100000),
+	('eval_ghost', bench_eval_ghost, 20000),
+	('rotate', bench_rotate, 100000),
+	('wall_kick', bench_wall_kick, 20000),
+	('find_placements', bench_find_placements, 1120),
+	('cached_placements', bench_cached_placements, 4000),
+	('features.scalar', bench_features_scalar, 6400),
+	('clear_lines.naive', clear_bench(0), 400),
+	('clear_lines.sticky', clear_bench(1), 400),
+	('clear_lines.cascade', clear_bench(2), 400),
+	('clear_lines.sticky_tall', bench_tall_cascade, 200),
+	('add_garbage', bench_add_garbage, 4000),
+	('render.empty', render_bench(), 200),
+	('render.full_stack', render_bench(stack_setup), 200),
+	('render.full_stack_stale', render_bench(stack_setup, True), 200),
+	('render.moving_piece', bench_render_moving, 400),
+	('render.mid_clear', render_bench(clear_setup), 200),
+	('render.mid_fall', render_bench(fall_setup, True), 200),
+	('render.main_menu', menu_bench(main_menu), 200),
+	('render.play_menu', menu_bench(play_menu), 200),
+	('render.score_menu', menu_bench(score_menu), 200),
+	('render.pause_menu', menu_bench(pause_menu), 200),
+	('render.save_menu', menu_bench(save_menu), 200),
+	('render.loss_menu', menu_bench(loss_menu), 200),
+)
+if features.np is not None:
+	# The batch features need NumPy, so they're only timed if it's there.
+	cases += (('features.batch', bench_features_batch, 25600), )
+
+def run (names=None, repeat=5, seed=0, scale=1.):
+	# Run the benchmarks, or just the ones whose names contain one of the given strings.
+	# Every run of a benchmark is seeded the same, so it times the same fixtures every time.
+	# Returns the results keyed by name, with the best and median time per operation in microseconds.
+	results = { }
+	for name, bench, number in cases:
+		if names and not any(part in name for part in names):
+			continue
+		times = [ ]
+		for r in range(repeat):
+			elapsed, ops = bench(random.Random(seed), max(int(number * scale), 1))
+			times.append(elapsed / ops * 1000000)
+		times.sort()
+		results[name] = {'best': times[0], 'median': times[len(times) // 2], 'ops': ops, 'repeat': repeat}
+	return results
+
+def machine_info ():
+	# What the benchmarks were run on, since times only compare fairly on the same machine.
+	return {
+		'python': platform.python_version(),
+		'pygame': pg.version.ver,
+		'platform': platform.platform(),
+		'processor': platform.processor() or platform.machine(),
+	}
+
+def save (path, results, seed):
+	# Write results to a JSON file, along with what they were run on.
+	with open(path, 'w') as rfile:
+		json.dump({'machine': machine_info(), 'seed': seed, 'results': results}, rfile, indent=1, sort_keys=True)
+
+def load (path):
+	# Read back the results saved to a JSON file.
+	with open(path) as rfile:
+		return json.load(rfile)['results']
+
+def compare (results, baseline, tolerance=0.2):
+	# Compare the best times against a baseline, as they're the least thrown off by whatever else the machine is doing.
+	# Returns (name, baseline, result, ratio, regressed) tuples for every benchmark in both,
+	# where it regressed if it's slower than the baseline by more than the tolerance.
+	return [
+		(name, baseline[name]['best'], result['best'], result['best'] / baseline[name]['best'],
+		result['best'] > baseline[name]['best'] * (1 + tolerance))
+		for name, result in results.items() if name in baseline
+	]
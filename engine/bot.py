@@ -0,0 +1,245 @@
+"Contains the bot, which plays pyTetris by pressing the same keys a player would."
+try:
+	import time
+	import pygame as pg
+	import engine.kicks as kicks
+	import engine.placements as placements
+	import engine.features as batch_features
+	from engine.shapes import Shape, Grid
+	from engine.userstate import User
+except ImportError:
+	print("The bot pulled its own plug:")
+	raise
+
+# Board features a placement is judged by, each multiplied by its weight and added up.
+features = (
+	'height', # Sum of the column heights.
+	'holes', # Empty cells with a filled one somewhere above them.
+	'bumpiness', # Sum of the height differences between neighbouring columns.
+	'wells', # Depth of the wells between columns, as engine/features.py counts them.
+	'lines', # Lines cleared, cascades included.
+	'score', # Score the clear would be worth, in thousands of points. This is where T-spins and cascades pay off.
+)
+default_weights = {
+	'height': -0.51,
+	'holes': -0.36,
+	'bumpiness': -0.18,
+	'wells': -0.1,
+	'lines': 0.76,
+	'score': 0.1,
+}
+# Key pressed for each input of a placement's move sequence, and for holding.
+move_keys = {
+	'left': pg.K_LEFT, 'right': pg.K_RIGHT, 'cw': pg.K_x, 'ccw': pg.K_z,
+	'down': pg.K_DOWN, 'drop': pg.K_SPACE, 'hold': pg.K_LSHIFT,
+}
+
+class Bot:
+	"""
+	The Bot plays a game on a Core by picking where each piece goes, then putting in the keys that get
+	it there, one event per frame, just like a player would. That makes it play the same whether it's
+	stepping a headless Simulation or showing off in the window.
+
+	Every placement the piece can reach is tried out on a Board and judged by a weighted sum of the
+	features above. Naive clears are worked out on the Board itself, but sticky and cascade clears are
+	run for real on a scratch grid, so the score the user would get is exactly what predict_score() says.
+	The next piece, or the held one, is judged the same way, and if it does better the piece is held instead.
+	With NumPy around, the features of all the boards a piece can leave behind are worked out in one batch.
+
+	Gravity keeps going while the keys are put in, so before the hard drop the bot checks that the piece
+	is where it meant it to be, and looks again from where the piece actually is if it isn't.
+	"""
+	__slots__ = (
+		'core', 'weights', 'cache', 'scratch', 'shape', 'plan', 'target', 'key', 'held', 'replans',
+		'placed', 'thinking', 'peak_height', 'total_holes',
+	)
+	max_replans = 3 # Times the bot looks again for one piece before giving up and dropping it wherever.
+	min_batch = 16 # Fewest boards worth working the features out for in a batch rather than one at a time.
+	danger_factor = 2. # How many times over height counts when the stack is in danger, to get it back down first.
+
+	def __init__ (self, core, weights=None, cache=None):
+		self.core = core # The game being played.
+		self.weights = dict(default_weights if weights is None else weights)
+		self.cache = cache # Transposition table to look placements up in, if any.
+		self.scratch = Grid(User()) # Grid for trying out line clears that aren't naive.
+		self.shape = Shape() # Shape for pasting placements to the scratch grid.
+		self.placed = 0 # Number of pieces placed.
+		self.thinking = 0. # Time spent picking placements, in seconds.
+		self.peak_height = 0 # Highest the stack has been when a piece locked.
+		self.total_holes = 0 # Holes in the grid when each piece locked, added up.
+		self.reset()
+
+	def __str__ (self):
+		# Placement rate, counting only the time spent thinking.
+		return "Bot: {} placements, {:.3f} ms thinking each ({:.0f} placements/sec), stack up to {} high with {:.1f} holes on average".format(
+			self.placed, self.thinking / self.placed * 1000 if self.placed else 0., self.placed / self.thinking if self.thinking else 0.,
+			self.peak_height, self.total_holes / self.placed if self.placed else 0.
+		)
+
+	def reset (self):
+		# Forget the current plan, like at the start of a game.
+		self.plan = None # Inputs still to be put in for the current piece, or None if there's no plan.
+		self.target = None # Placement the plan ends in.
+		self.key = None # Key currently held down.
+		self.held = False # True once the current piece has been held, so it doesn't get held back and forth.
+		self.replans = 0 # Times the current piece has been planned again.
+
+	def inputs (self):
+		# Endless stream of events for a headless Simulation to run on.
+		while True:
+			yield self.get_event()
+
+	def get_event (self):
+		# The event to put in this frame, or None if there's nothing to press.
+		core = self.core
+		if not core.entry_flag or core.clearing or core.user.state != 'game':
+			if self.plan is not None:
+				# The piece locked, one way or another.
+				self.placed += 1
+				self.peak_height = max(self.peak_height, core.grid.get_stack_height())
+				self.total_holes += core.grid.holes
+				self.plan = None
+				self.target = None
+				self.held = False
+				self.replans = 0
+			return self.release()
+		if self.key is not None and self.key != pg.K_DOWN:
+			# Let go of whatever was pressed last frame.
+			return self.release()
+		if self.plan is None:
+			self.think(not self.held and not core.hold_lock)
+		move = self.plan[0]
+		if move == 'down':
+			# Hold soft drop until the piece lands.
+			if self.key is None:
+				return self.press(pg.K_DOWN)
+			if not core.eval_gravity():
+				return None
+			self.plan.pop(0)
+			return self.release()
+		if move == 'drop' and self.replans < self.max_replans:
+			# Make sure the piece is where it was meant to be, in case gravity got in the way.
+			core.eval_ghost()
+			target = self.target
+			if (core.freeshape.state, core.freeshape.pos[0], core.ghostshape.pos[1]) != (target.state, target.x, target.y):
+				self.replans += 1
+				self.think(False)
+				return None
+		self.plan.pop(0)
+		if move == 'hold':
+			self.held = True
+			self.plan = None
+		return self.press(move_keys[move])
+
+	def press (self, key):
+		self.key = key
+		return pg.event.Event(pg.KEYDOWN, key=key)
+
+	def release (self):
+		if self.key is None:
+			return None
+		event = pg.event.Event(pg.KEYUP, key=self.key)
+		self.key = None
+		return event
+
+	def think (self, can_hold):
+		# Plan the inputs for the active piece, or to hold it if that looks better.
+		start = time.perf_counter()
+		core = self.core
+		board = placements.Board.from_grid(core.grid)
+		value, best = self.pick(core.get_placements(self.cache), board)
+		if can_hold:
+			# The piece that comes in when this one's held starts where pieces spawn.
+			form = core.storedshape.form if core.storedshape.form < 7 else core.nextshapes[0].form
+			if form != core.freeshape.form:
+				table = kicks.tables[core.user.rotsystem] if core.user.enablekicks else None
+				if self.cache is not None:
+					found = placements.cached_placements(self.cache, board, form, table)
+				else:
+					found = placements.find_placements(board, form, table)
+				held_value, held = self.pick(found, board)
+				if held is not None and (best is None or held_value > value):
+					best = None
+					self.plan = ['hold']
+		if best is not None:
+			self.target = best
+			self.plan = list(best.moves)
+		elif self.plan is None:
+			# There's nowhere to go, so just drop it.
+			self.target = None
+			self.plan = ['drop']
+			self.replans = self.max_replans
+		self.thinking += time.perf_counter() - start
+
+	def pick (self, found, board, cleartype=None):
+		# The best of the given placements on a board and its value, or None if there aren't any.
+		# Refer to play_out() for the clear type.
+		ranked = self.rank(found, board, cleartype)
+		if not ranked:
+			return None, None
+		return ranked[0][0], ranked[0][1]
+
+	def rank (self, found, board, cleartype=None):
+		# Every given placement on a board, best first, as (value, placement, outcome) where the outcome
+		# is what play_out() gives. Placements that are just as good stay in the order they were given.
+		outcomes = [self.play_out(placement, board, cleartype) for placement in found]
+		if batch_features.np is not None and len(outcomes) >= self.min_batch:
+			batch = batch_features.extract(batch_features.from_boards([outcome[0] for outcome in outcomes]))
+			rows = zip(
+				batch['heights'].sum(axis=1).tolist(), batch['holes'].tolist(),
+				batch['bumpiness'].tolist(), batch['wells'].tolist()
+			)
+		else:
+			# Too few boards to be worth a batch, or no NumPy, so they're worked out one at a time by the same reference the batches are checked against.
+			rows = [ ]
+			for outcome in outcomes:
+				counted = batch_features.reference(outcome[0].get_rows())
+				rows.append((sum(counted['heights']), counted['holes'], counted['bumpiness'], counted['wells']))
+		weights = self.weights
+		# The grid keeps track of how high its stack is, so checking for danger doesn't take a look at the board.
+		height_weight = weights['height'] * (self.danger_factor if self.core.in_danger() else 1.)
+		values = [
+			height_weight * height + weights['holes'] * holes + weights['bumpiness'] * bumpiness
+			+ weights['wells'] * wells + weights['lines'] * lines + weights['score'] * score / 1000.
+			for (after, lines, score), (height, holes, bumpiness, wells) in zip(outcomes, rows)
+		]
+		order = sorted(range(len(found)), key=lambda i: -values[i])
+		return [(values[i], found[i], outcomes[i]) for i in order]
+
+	def play_out (self, placement, board, cleartype=None):
+		# The board a placement leaves behind, given a board, with the lines it clears and the score they're worth.
+		# Clears are worked out with the user's clear type unless another one is given. Sticky and cascade clears
+		# need the colors and links of the blocks, so they're played out on a copy of the grid, and only come out
+		# right for a board of the grid itself. Any other board needs a clear type of 0, to clear it naively.
+		core = self.core
+		user = core.user
+		if cleartype is None:
+			cleartype = user.cleartype
+		board = board.copy()
+		board.paste(placement)
+		lines = board.clear_lines()
+		line_list = [lines]
+		if lines and cleartype > 0:
+			# Sticky and cascade clears can set off more clears, so let the real grid code work it out.
+			scratch = self.scratch
+			# The clear gets scored on the scratch user too, so start it over every time, or its combo
+			# keeps growing with every placement played out until the score overflows.
+			scratch.user.reset()
+			scratch.user.cleartype = cleartype
+			scratch.copy_from(core.grid)
+			self.shape.set_form(placement.form, placement.state, [placement.x, placement.y])
+			scratch.paste_shape(self.shape)
+			clearer = scratch.clear_lines()
+			while next(clearer):
+				pass
+			line_list = scratch.user.line_list
+			lines = sum(line_list)
+			board = placements.Board.from_grid(scratch)
+		score = 0
+		if lines:
+			# Score the clear as if the piece locked right now, with the flags it would lock with.
+			saved = user.line_list, user.twist_flag, user.tspin_flag
+			user.line_list, user.twist_flag, user.tspin_flag = line_list, placement.twist, placement.tspin
+			score = user.predict_score(not board.rows[placements.pad + 21])
+			user.line_list, user.twist_flag, user.tspin_flag = saved
+		return board, lines, score
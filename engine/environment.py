@@ -3,9 +3,11 @@ try:
 	import os
 	import sys
 	import math
+	import time
 	import random
 	import datetime
 	import pygame as pg
+	from collections import OrderedDict, deque
 	from engine.userstate import User
 except ImportError:
 	print("A module must've shat itself:")
@@ -92,16 +94,187 @@ def convert_hexcolor (hexcolor):
 		hexcolor = hexcolor * 256 + 255 # Assume opaque
 	return pg.Color(hexcolor)
 
+fonts = { } # Every font loaded so far, keyed by name and size, so they're only loaded once.
+text_cache = OrderedDict() # Recently rendered text surfaces, keyed by font, text and color, least recently used first.
+text_cache_size = 256 # Number of text surfaces kept in the cache before the least recently used one goes.
+glyph_atlases = { } # Glyph atlases for numbers, keyed by font and color.
+
+def get_font (size, name=None):
+	# Fetch a font from the registry, loading it the first time it's asked for.
+	try:
+		return fonts[name, size]
+	except KeyError:
+		font = fonts[name, size] = pg.font.SysFont(name, size)
+		return font
+
+def render_cached (font, text, color):
+	# Render a line of text, or fetch it from the cache if it was rendered recently.
+	key = (font, text, color if isinstance(color, int) else tuple(color))
+	try:
+		tsurf = text_cache[key]
+		text_cache.move_to_end(key)
+	except KeyError:
+		tsurf = text_cache[key] = font.render(text, 0, convert_hexcolor(color) if isinstance(color, int) else color)
+		if len(text_cache) > text_cache_size:
+			text_cache.popitem(last=False)
+	return tsurf
+
+def text_size (font, text):
+	# The size of a line of text when drawn by render_text().
+	if text and GlyphAtlas.charset.issuperset(text):
+		return sum(font.size(char)[0] for char in text), font.get_height()
+	return font.size(text)
+
+def text_rect (font, text, **anchors):
+	# The rect a line of text is drawn in by render_text() with the same anchors.
+	rect = pg.Rect((0, 0), text_size(font, text))
+	for point, anchor in anchors.items():
+		setattr(rect, point, anchor)
+	return rect
+
+def merge_rects (rects):
+	# Group rects into fewer that cover them all without covering much else. Two rects are merged when the
+	# area around both isn't any bigger than the two of them, so rects that overlap or sit next to each other
+	# become one, while rects on opposite sides of the screen stay apart.
+	merged = [ ]
+	for rect in rects:
+		rect = pg.Rect(rect)
+		joined = True
+		while joined:
+			joined = False
+			for i, other in enumerate(merged):
+				union = rect.union(other)
+				if union.w * union.h <= rect.w * rect.h + other.w * other.h:
+					rect = union
+					del merged[i]
+					joined = True
+					break
+		merged.append(rect)
+	return merged
+
 def render_text (obj=None, text='', color=0, surf=screen, **anchors):
 	# Takes an object with a font attribute, and creates a text surface that it blits to a given surface.
 	# Can be added to any class as a method, provided that class instances have a font attribute.
-	if isinstance(color, int):
-		color = convert_hexcolor(color)
-	try:
-		tsurf = obj.font.render(text, 0, color)
-	except AttributeError:
-		tsurf = pg.font.SysFont(None, 25).render(text, 0, color)
-	surf.blit(tsurf, tsurf.get_rect(**anchors))
+	# Numbers are put together from a glyph atlas, everything else goes through the text cache.
+	font = getattr(obj, 'font', None) or get_font(25)
+	if text and GlyphAtlas.charset.issuperset(text):
+		key = (font, color if isinstance(color, int) else tuple(color))
+		try:
+			atlas = glyph_atlases[key]
+		except KeyError:
+			atlas = glyph_atlases[key] = GlyphAtlas(font, convert_hexcolor(color) if isinstance(color, int) else color)
+		atlas.draw(text, surf, text_rect(font, text, **anchors).topleft)
+	else:
+		tsurf = render_cached(font, text, color)
+		surf.blit(tsurf, tsurf.get_rect(**anchors))
+
+class GlyphAtlas:
+	"""
+	Digits and the timer separator pre-rendered side by side in one surface, for one font and color.
+
+	Scores, timers and the like change nearly every frame, so rather than rendering them anew
+	they're put together by blitting each character's slice of the atlas in turn.
+	"""
+	__slots__ = ('image', 'clips')
+	chars = '0123456789:'
+	charset = frozenset(chars)
+
+	def __init__ (self, font, color):
+		glyphs = [font.render(char, 0, color) for char in self.chars]
+		self.image = pg.Surface((sum(glyph.get_width() for glyph in glyphs), font.get_height()))
+		# Anything but the text color will do as the colorkey.
+		key = pg.Color(255 - color.r, 255 - color.g, 255 - color.b)
+		self.image.fill(key)
+		self.image.set_colorkey(key)
+		self.clips = { }
+		x = 0
+		for char, glyph in zip(self.chars, glyphs):
+			self.image.blit(glyph, (x, 0))
+			self.clips[char] = pg.Rect(x, 0, glyph.get_width(), self.image.get_height())
+			x += glyph.get_width()
+
+	def draw (self, text, surf, pos):
+		# Blit the text to a surface, with its topleft corner at the given position.
+		x, y = pos
+		for char in text:
+			clip = self.clips[char]
+			surf.blit(self.image, (x, y), clip)
+			x += clip.w
+
+class Pacer:
+	"""
+	Runs a simulation in fixed-length ticks against a monotonic clock, independently of how often
+	the screen gets drawn. Time is added up as it passes and spent a tick at a time, so a slow frame
+	is made up for with extra ticks on the next one rather than slowing the game down, and the game
+	plays out the same no matter how fast or unevenly it's drawn.
+
+	While the simulation is behind, a few frames in a row can go undrawn so it can catch up.
+	It also keeps the time between the last few presented frames, to measure frame pacing jitter.
+	"""
+	__slots__ = (
+		'step', 'max_ticks', 'max_lag', 'max_skips', 'clock',
+		'last', 'lag', 'skips', 'presented', 'intervals', 'ticks', 'skipped', 'dropped',
+	)
+
+	def __init__ (self, rate, max_ticks=5, max_skips=3, samples=300, clock=time.perf_counter):
+		self.step = 1. / rate # Length of a tick in seconds.
+		self.max_ticks = max_ticks # Most ticks run before a frame is drawn.
+		self.max_lag = self.step * max_ticks * 4 # Most time that can be owed before the rest is given up on.
+		self.max_skips = max_skips # Most frames in a row that can go undrawn.
+		self.clock = clock # Monotonic clock that returns the time in seconds.
+		self.intervals = deque(maxlen=samples) # Time between each of the last few presented frames.
+		self.ticks = 0 # Total ticks called for.
+		self.skipped = 0 # Total frames that went undrawn.
+		self.dropped = 0. # Total time given up on, in seconds.
+		self.resume()
+
+	def __str__ (self):
+		# Frame pacing report.
+		if not self.intervals:
+			return "Frame pacing: no frames presented yet."
+		mean = sum(self.intervals) / len(self.intervals)
+		jitter = math.sqrt(sum((interval - mean) ** 2 for interval in self.intervals) / len(self.intervals))
+		return (
+			"Frame pacing over the last {} frames: {:.2f} ms mean, {:.2f} ms jitter, {:.2f} ms worst.\n"
+			"{} ticks, {} frames skipped, {:.0f} ms of lag given up on."
+		).format(len(self.intervals), mean*1000, jitter*1000, max(self.intervals)*1000, self.ticks, self.skipped, self.dropped*1000)
+
+	def resume (self):
+		# Start counting time from now, so any time that passed while the simulation wasn't running doesn't count.
+		self.last = self.clock()
+		self.lag = 0. # Time passed that hasn't been spent on ticks yet.
+		self.skips = 0 # Frames that went undrawn in a row.
+		self.presented = None # When the last frame was presented.
+
+	def advance (self):
+		# Returns the number of ticks to run for the time that passed since the last call.
+		now = self.clock()
+		self.lag += now - self.last
+		self.last = now
+		if self.lag > self.max_lag:
+			# Too far behind to ever catch up, so let the time go instead of spiraling.
+			self.dropped += self.lag - self.max_lag
+			self.lag = self.max_lag
+		ticks = min(int(self.lag / self.step), self.max_ticks)
+		self.lag -= ticks * self.step
+		self.ticks += ticks
+		return ticks
+
+	def skip_frame (self):
+		# True if the simulation is still behind and this frame can go undrawn to catch up.
+		if self.lag >= self.step and self.skips < self.max_skips:
+			self.skips += 1
+			self.skipped += 1
+			return True
+		self.skips = 0
+		return False
+
+	def present (self):
+		# Note the time a frame was presented.
+		now = self.clock()
+		if self.presented is not None:
+			self.intervals.append(now - self.presented)
+		self.presented = now
 
 def load_music(name):
 	# Loads a music file into the stream.
@@ -306,7 +479,7 @@ class Menu (AnimatedSprite):
 		super().__init__(bg, rect, **pos)
 
 		self.user = user
-		self.font = pg.font.SysFont(None, 25)
+		self.font = get_font(25)
 		# Coordinates of currently selected selection.
 		self.selection = [0, 0]
 		# All menus will have their own selections set, effectively a 2d array, with the range length set at every instance.
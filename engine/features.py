@@ -0,0 +1,147 @@
+"Works out the board features the bot judges placements by, for whole batches of boards at once."
+try:
+	import engine.placements as placements
+	from engine.shapes import Grid
+except ImportError:
+	print("Couldn't make out any features:")
+	raise
+try:
+	import numpy as np
+except ImportError:
+	# NumPy is optional, and only the batch functions need it. The scalar reference works without it.
+	np = None
+
+# Features worked out for every board, in the order they're returned in.
+features = (
+	'heights', # Height of every column, from the floor to its top block.
+	'holes', # Empty cells with a filled one somewhere above them.
+	'row_transitions', # Times neighbouring cells in a row go from filled to empty or back, the walls being filled. Empty rows don't count.
+	'col_transitions', # The same down every column, from the empty space above the grid to the filled floor below it.
+	'wells', # Sum of how far each column sits below both of its neighbours, the walls being as high as it gets.
+	'bumpiness', # Sum of the height differences between neighbouring columns.
+	'full_rows', # Bitmask of the full rows, with bit j set if row j is full.
+)
+
+# Bits set in every 11-bit number, which covers a row with a wall on either side.
+bit_counts = [bin(mask).count('1') for mask in range(1 << 11)]
+
+def popcount (mask):
+	return bit_counts[mask]
+
+def reference (rows):
+	# The features of a single board, given as the grid's 23 row bitmasks, with plain Python loops and ints.
+	# This is what the batch functions are checked against, and what the bot uses for boards too few to batch,
+	# so it's written to be obviously right first and quick second.
+	heights = [0] * 10
+	covered = 0 # Columns that have had a filled cell above the current row.
+	above = 0 # The row above the current one, which starts out as the empty space above the grid.
+	holes = 0
+	row_transitions = 0
+	col_transitions = 0
+	full_rows = 0
+	for j in range(22):
+		row = rows[j]
+		if not row and not covered:
+			# Nothing above the stack counts towards anything.
+			continue
+		# Columns filled here for the first time have their top block in this row.
+		top = row & ~covered
+		if top:
+			for col in range(10):
+				if top >> col & 1:
+					heights[col] = 22 - j
+		covered |= row
+		holes += popcount(covered & ~row)
+		if row:
+			# Put a filled wall on either side, then count the neighbours that differ.
+			walled = row << 1 | 0x801
+			row_transitions += popcount((walled ^ walled >> 1) & 0x7FF)
+		col_transitions += popcount(row ^ above)
+		above = row
+		if row == Grid.full_row:
+			full_rows |= 1 << j
+	col_transitions += popcount(above ^ Grid.full_row)
+	wells = 0
+	bumpiness = 0
+	for col in range(10):
+		left = heights[col - 1] if col > 0 else 22
+		right = heights[col + 1] if col < 9 else 22
+		if left > heights[col] and right > heights[col]:
+			wells += min(left, right) - heights[col]
+		if col < 9:
+			bumpiness += abs(heights[col] - right)
+	return {
+		'heights': heights, 'holes': holes, 'row_transitions': row_transitions, 'col_transitions': col_transitions,
+		'wells': wells, 'bumpiness': bumpiness, 'full_rows': full_rows,
+	}
+
+if np is not None:
+	# Bits set in every 11-bit number, for counting them in whole arrays at once.
+	popcounts = np.array(bit_counts, dtype=np.int64)
+	# Shift that brings each column's bit down to the bottom.
+	col_shifts = np.arange(10, dtype=np.int32)
+	# Bit of every visible and hidden row in the full row mask.
+	row_bits = np.int64(1) << np.arange(22, dtype=np.int64)
+
+def pack (cells):
+	# Packed row bitmasks from a batch of boards given cell by cell, shaped N x 23 x 10 with anything nonzero being filled.
+	return ((np.asarray(cells) != 0).astype(np.uint16) << col_shifts.astype(np.uint16)).sum(axis=-1, dtype=np.uint16)
+
+def unpack (packed):
+	# A batch of boards cell by cell, shaped N x 23 x 10, from their packed row bitmasks.
+	return (np.asarray(packed)[..., None] >> col_shifts.astype(np.uint16) & 1).astype(bool)
+
+def from_grids (grids, out=None):
+	# Packed row bitmasks of a batch of grids, as an N x 23 array of 16-bit rows.
+	# They're read straight off the grids' bitboards, which already have this layout, so their blocks
+	# are never looked at and nothing is built in between. Given an array to fill, the rows go straight into it.
+	if out is None:
+		return np.array([grid.rows for grid in grids], dtype=np.uint16)
+	for n, grid in enumerate(grids):
+		out[n] = grid.rows
+	return out
+
+def from_boards (boards, out=None):
+	# The same as from_grids(), for placement search boards, leaving out their padding.
+	start, end = placements.pad, placements.pad + 23
+	if out is None:
+		return np.array([board.rows[start:end] for board in boards], dtype=np.uint16)
+	for n, board in enumerate(boards):
+		out[n] = board.rows[start:end]
+	return out
+
+def extract (boards):
+	# The features of a whole batch of boards, given either as packed rows shaped N x 23 or cell by cell
+	# shaped N x 23 x 10. Every feature is worked out for all of them at once, and returned as an array
+	# with one entry per board, or N x 10 for the heights. They come out the same as reference() would give.
+	boards = np.asarray(boards)
+	if boards.ndim == 3:
+		boards = pack(boards)
+	rows = boards[:, :22].astype(np.int32)
+	# A column is covered in every row from its top block down, so its height is how many rows it's covered in.
+	covered = np.bitwise_or.accumulate(rows, axis=1)
+	heights = (covered[:, :, None] >> col_shifts & 1).sum(axis=1, dtype=np.int64)
+	holes = popcounts[covered & ~rows].sum(axis=1)
+	walled = rows << 1 | 0x801
+	row_transitions = np.where(rows != 0, popcounts[(walled ^ walled >> 1) & 0x7FF], 0).sum(axis=1)
+	above = np.concatenate((np.zeros((len(rows), 1), dtype=np.int32), rows[:, :-1]), axis=1)
+	col_transitions = popcounts[rows ^ above].sum(axis=1) + popcounts[rows[:, -1] ^ Grid.full_row]
+	# The walls count as columns as high as the grid on either side.
+	walls = np.full((len(rows), 1), 22, dtype=np.int64)
+	sides = np.concatenate((walls, heights, walls), axis=1)
+	depths = np.minimum(sides[:, :-2], sides[:, 2:]) - heights
+	wells = np.where(depths > 0, depths, 0).sum(axis=1)
+	bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+	full_rows = np.where(rows == Grid.full_row, row_bits, 0).sum(axis=1)
+	return {
+		'heights': heights, 'holes': holes, 'row_transitions': row_transitions, 'col_transitions': col_transitions,
+		'wells': wells, 'bumpiness': bumpiness, 'full_rows': full_rows,
+	}
+
+def check (packed):
+	# Indices of the boards in a packed batch whose batch features don't match the reference ones.
+	batch = extract(packed)
+	return [
+		n for n, rows in enumerate(packed.tolist())
+		if any(np.asarray(batch[name][n]).tolist() != value for name, value in reference(rows).items())
+	]
@@ -7,7 +7,13 @@ try:
 	import engine.environment as env
 	import engine.filehandler as fh
 	import engine.menu as menu
-	from engine.shapes import (Shape, Grid)
+	import engine.kicks as kicks
+	import engine.placements as placements
+	from engine.bot import Bot
+	from engine.hints import HintEngine
+	from engine.shapes import (Shape, Piece, pieces, Grid)
+	from engine.replay import Replay
+	from engine.profiler import Profiler, null_profiler
 	from engine.sortedcollections import SortedCollection as SC
 except ImportError:
 	print("A tetrimino fell through the fucking floor:")
@@ -27,6 +33,15 @@ class Core:
 	"""
 	bg = pg.Surface(env.screct.size)
 	bg.fill(0x000000)
+	framerate = 50 # Frames per second the game logic is balanced around.
+	record = False # Save a replay of every game played.
+	replay = None # Replay of the current game, if it's being recorded.
+	playback = None # Replay being played back instead of reading the player's input, if any.
+	uncapped = False # Play replays back as fast as possible instead of in real time.
+	profiler = null_profiler # Times each phase of a frame in debug mode.
+	bot = None # Bot playing the game in demo mode, if any.
+	hints = None # Hint engine searching in the background, started the first time hints are shown.
+	danger_row = 6 # The danger indicator lights up once the stack reaches this row. Pieces spawn in rows 0 to 2.
 
 	def __init__ (self, user, pause_menu, save_menu, loss_menu):
 		self.user = user
@@ -34,10 +49,14 @@ class Core:
 		self.save_menu = save_menu
 		self.loss_menu = loss_menu
 
-		self.font = pg.font.SysFont(None, 25)
+		self.font = env.get_font(25)
 		self.theme = env.load_music('tetris.ogg')
 
 		self.grid = Grid(user)
+		self.drawn = { } # What each part of the screen showed last frame, and where it was drawn.
+		self.dirty = [ ] # Parts of the screen that need to be redrawn this frame.
+		self.redraw = True # Redraw the whole screen on the next frame, like when coming back from a menu.
+		self.pacer = env.Pacer(self.framerate) # Runs the game logic at its framerate, however fast the screen is drawn.
 		self.set_data()
 
 	def __str__ (self):
@@ -51,14 +70,29 @@ class Core:
 			"Grid State:\n"+str(self.grid)+"\n"
 		)
 
-	def set_data (self):
+	def set_data (self, seed=None):
 		# Initializes the game data.
+		self.end_replay()
+		# Every game gets its own seed, so the pieces and garbage it gets can be played back later.
+		if seed is None:
+			seed = self.playback.seed if self.playback is not None else random.randrange(1 << 32)
+		self.seed = seed
+		self.rng = random.Random(seed)
+		self.grid.rng = self.rng
+		if self.record and self.playback is None:
+			self.replay = Replay.from_user(seed, self.user)
+		self.redraw = True
+		if self.bot is not None:
+			self.bot.reset()
 		self.grid.set_cells()
-		self.nextshapes = self.gen_shapelist() # List of next shapes.
+		self.nextshapes = self.gen_shapelist() # List of next pieces.
+		# The free, test and ghost shapes are reused for every tetrimino that comes into play.
 		self.freeshape = Shape() # The actual free tetrimino
 		self.newshape = Shape() # Potential new position to be checked.
-		self.ghostshape = Shape() # Ghost position for hard drop
-		self.storedshape = Shape() # Tetrimino currently being held for later use.
+		self.ghostshape = Shape(ghost=True) # Ghost position for hard drop
+		self.ghostkey = None # The free tetrimino and grid state the ghost was last evaluated for.
+		self.hintshape = Shape(ghost=True) # Best placement the hint engine has found so far.
+		self.storedshape = pieces[7] # Piece currently being held for later use.
 
 		self.clearing = False # Puts the game on hold when clearing loops.
 		self.paused = False # Alerts the game to pause.
@@ -100,21 +134,19 @@ class Core:
 		self.grav_delay = self.fall_delay # Currently used gravity delay.
 
 	def gen_shapelist (self):
-		# Generate a 'bag' of one of each tetrimino shape in random order.
-		s_list = [Shape(i) for i in range(7)]
-		random.shuffle(s_list)
+		# Generate a 'bag' of one of each tetrimino piece in random order.
+		s_list = list(pieces[:7])
+		self.rng.shuffle(s_list)
 		return s_list
 
 	def set_shape (self, shape):
 		# Set the active shape and reset shape-associated flags.
+		# The shape can be given as a piece or just its form.
 		self.floor_kick = True
 		self.hold_lock = False
-		if isinstance(shape, Shape):
-			self.freeshape = shape
-		else:
-			self.freeshape = Shape(shape)
-		self.newshape = self.freeshape.copy()
-		self.ghostshape = self.freeshape.copy(True)
+		form = shape.form if isinstance(shape, Piece) else shape
+		self.freeshape.set_form(form)
+		self.newshape.set_form(form)
 		self.eval_ghost()
 		# Test for obstructions. If they exist, the player lost.
 		self.eval_block()
@@ -129,8 +161,7 @@ class Core:
 	def hold_shape (self):
 		# Holds a tetrimino in storage until retrieved.
 		if self.storedshape.form > 6:
-			self.storedshape = Shape(
-				self.newshape.form if self.entry_flag else self.nextshapes[0].form, 0)
+			self.storedshape = pieces[self.newshape.form if self.entry_flag else self.nextshapes[0].form]
 			self.next_shape()
 		else:
 			# If storage already has a tetrimino, swap with current active one.
@@ -138,33 +169,23 @@ class Core:
 				self.hold_lock = True
 				if self.entry_flag:
 					# You can only swap once per piece and can't swap if it's the same shape as the active piece.
-					self.freeshape, self.storedshape = Shape(self.storedshape.form), Shape(self.freeshape.form)
-					self.newshape = self.freeshape.copy()
+					form, self.storedshape = self.storedshape.form, pieces[self.freeshape.form]
+					self.freeshape.set_form(form)
+					self.newshape.set_form(form)
+					# The held piece comes back in where pieces spawn, so it can be blocked just the same.
+					self.eval_block()
 				else:
 					# Allow pieces to be swapped during spawn delay.
 					self.nextshapes[0], self.storedshape = self.storedshape, self.nextshapes[0]
 
 	def check_collision (self, shape):
 		# Check if the shape to be evaluated is intersecting with any other blocks on the grid.
-		for pos in shape.poslist:
-			if pos[1] < 0:
-				# Ideally, it's impossible to get above the grid, but just in case...
-				continue
-			elif pos[0] < 0 or pos[0] >= len(self.grid[0]) or pos[1] >= len(self.grid):
-				# If a block is outside the grid's bounding box, then a collision has occured.
-				return True
-			elif self.grid[pos[1]][pos[0]] is not None: 
-				# If a block would move to an already occupied cell on the grid, then a collision has occured.
-				return True
-		else: return False
-
-	def eval_input (self):
-		# Evaluates player input.
-		event = pg.event.poll()
-		if ((event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE)
-			or not pg.key.get_focused()):
-			# Pause game when the user presses the pause key, or when the window loses focus.
-			pg.mixer.music.pause()
+		return self.grid.collides(shape.orientation.rowmasks, *shape.pos)
+
+	def eval_input (self, event):
+		# Evaluates player input for a single event.
+		if event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE:
+			# Pause game when the user presses the pause key.
 			self.paused = True
 
 		if event.type == pg.QUIT: # Exits the game.
@@ -185,6 +206,8 @@ class Core:
 				self.soft_pos = self.newshape.pos[1]
 			elif event.key == pg.K_LSHIFT: # Hold tetrimino to storage
 				self.hold_shape()
+			elif event.key == pg.K_h: # Toggle hints
+				self.user.showhint = not self.user.showhint
 
 			elif self.entry_flag:
 				if event.key == pg.K_z or event.key == pg.K_LCTRL: # Rotate CCW
@@ -196,6 +219,8 @@ class Core:
 
 				elif event.key == pg.K_SPACE: # Hard drop
 					self.user.hard_flag = True
+					# Garbage can come in after the ghost was last evaluated, so make sure it's current.
+					self.eval_ghost()
 					posdif = self.ghostshape.pos[1] - self.freeshape.pos[1]
 					self.freeshape.pos = self.ghostshape.pos[:]
 					self.eval_fallen(posdif)
@@ -213,7 +238,6 @@ class Core:
 					if self.check_collision(self.freeshape):
 						self.freeshape.translate(( 0,-1))
 						self.newshape.translate(( 0,-1))
-					self.grid.update()
 				elif event.key == pg.K_0: # Clear board
 					self.grid.set_cells()
 
@@ -258,118 +282,94 @@ class Core:
 
 	def eval_ghost (self):
 		# Evaluate the position of the ghost guide.
-		self.ghostshape = self.freeshape.copy(True)
-		while True:
-			self.ghostshape.translate(( 0, 1))
-			if self.check_collision(self.ghostshape):
-				self.ghostshape.translate(( 0,-1))
-				break
+		# This only needs redoing once the free tetrimino moves or rotates, or the grid changes.
+		shape = self.freeshape
+		key = (shape.form, shape.state, shape.pos[0], shape.pos[1], self.grid.version)
+		if key == self.ghostkey:
+			return
+		self.ghostkey = key
+		self.ghostshape.set_form(shape.form, shape.state, [shape.pos[0], shape.pos[1] + self.grid.drop_distance(shape.orientation, *shape.pos)])
+
+	def eval_hint (self):
+		# Keep the hint engine searching the current position, and show the best placement it's found so far.
+		# This only hands snapshots over and reads results back, so it takes no time out of the frame.
+		if not self.user.showhint or not self.entry_flag or self.clearing or self.user.state != 'game':
+			self.hintshape.set_form()
+			return
+		if self.hints is None:
+			self.hints = HintEngine()
+		hint = self.hints.get_result(self.hints.submit(self))
+		if hint is None:
+			self.hintshape.set_form()
+		else:
+			form, state, x, y = hint
+			self.hintshape.set_form(form, state, [x, y])
 
 	def eval_tspin (self):
 		# If a twist hasn't occured after a successful rotation,
 		# and the piece is a T, check if it's in a position for a valid T-spin.
 		if not self.user.twist_flag and self.freeshape.form == 2:
-			cornercount = 0
-			if (self.grid
-					[self.freeshape.pos[1] - 1]
-					[self.freeshape.pos[0] - 1] is not None):
-				cornercount += 1
-			if (self.grid
-					[self.freeshape.pos[1] - 1]
-					[self.freeshape.pos[0] + 1] is not None):
-				cornercount += 1
-			if (self.grid
-					[self.freeshape.pos[1] + 1]
-					[self.freeshape.pos[0] - 1] is not None):
-				cornercount += 1
-			if (self.grid
-					[self.freeshape.pos[1] + 1]
-					[self.freeshape.pos[0] + 1] is not None):
-				cornercount += 1
-			if cornercount == 3:
+			if self.grid.count_corners(*self.freeshape.pos) == 3:
 				self.user.tspin_flag = True
 
-	def test_kicks (self, poslist):
-		# Test four kick positions.
-		for pos in poslist:
+	def test_kicks (self, offsets):
+		# Test kick offsets in order, probing the grid directly instead of moving the test shape around.
+		rowmasks = self.newshape.orientation.rowmasks
+		x, y = self.freeshape.pos
+		for dx, dy in offsets:
 			# Test if a given relative position will cause a collision.
-			if pos[1] >= 0 or (pos[1] < 0 and self.floor_kick):
+			if dy >= 0 or self.floor_kick:
 				# Disable the floor kick flag if the position would make the piece go up.
-				if pos[1] < 0: self.floor_kick = False
-				# Set the test position to the original position before translating.
-				self.newshape.pos = self.freeshape.pos[:]
-				self.newshape.translate(pos)
-				# Perform the collision check.
-				if not self.check_collision(self.newshape):
+				if dy < 0: self.floor_kick = False
+				if not self.grid.collides(rowmasks, x + dx, y + dy):
+					# Move the test shape to the first position that fits.
+					self.newshape.pos = [x + dx, y + dy]
 					break
 		else:
 			# If none of the kick positions are valid, a twist didn't occur.
 			self.user.twist_flag = False
 			# Undo the rotation.
-			self.newshape = self.freeshape.copy()
+			self.newshape.state = self.freeshape.state
+			self.newshape.pos = self.freeshape.pos[:]
 
 	def wall_kick (self):
-		# Arika Implementation of wall kicks for I-symmetricity about the y-axis.
-		# All else is SRS.
+		# Kicks are looked up in the table for the rotation system selected in the user settings.
 		# The O piece cannot rotate, and therefore cannot be kicked.
 		if self.freeshape.form != 1:
 			# Check if the inital rotation caused a collision.
 			self.user.twist_flag = self.check_collision(self.newshape)
 			# Assume a twist will occur, and check which position is valid.
 			if self.user.enablekicks and self.user.twist_flag:
-				# If collision occurs on basic rotation, test 4 kick positions.
-				if self.freeshape.state == 0:
-					if self.newshape.state == 3: # Rotation from spawn to CCW
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([( 1, 0), ( 1,-1), ( 0, 2), ( 1, 2)])
-						else: # I
-							self.test_kicks([( 2, 0), (-1, 0), (-1,-2), ( 2, 1)])
-					elif self.newshape.state == 1: # Rotation from spawn to CW
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([(-1, 0), (-1,-1), ( 0, 2), (-1, 2)])
-						else: # I
-							self.test_kicks([(-2, 0), ( 1, 0), ( 1,-2), (-2, 1)])
-				elif self.freeshape.state == 1:
-					if self.newshape.state == 0: # Rotation from CW to spawn
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([( 1, 0), ( 1, 1), ( 0,-2), ( 1,-2)])
-						else: # I
-							self.test_kicks([( 2, 0), (-1, 0), ( 2,-1), (-1, 2)])
-					elif self.newshape.state == 2: # Rotation from CW to 180
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([( 1, 0), ( 1, 1), ( 0,-2), ( 1,-2)])
-						else: # I
-							self.test_kicks([(-1, 0), ( 2, 0), (-1,-2), ( 2, 1)])
-				elif self.freeshape.state == 2:
-					if self.newshape.state == 1: # Rotation from 180 to CW
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([(-1, 0), (-1,-1), ( 0, 2), (-1, 2)])
-						else: # I
-							self.test_kicks([(-2, 0), ( 1, 0), (-2,-1), ( 1, 1)])
-					elif self.newshape.state == 3: # Rotation from 180 to CCW
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([( 1, 0), ( 1,-1), ( 0, 2), ( 1, 2)])
-						else: # I
-							self.test_kicks([( 2, 0), (-1, 0), ( 2,-1), (-1, 1)])
-				elif self.freeshape.state == 3:
-					if self.newshape.state == 2: # Rotation from CCW to 180
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([(-1, 0), (-1, 1), ( 0,-2), (-1,-2)])
-						else: # I
-							self.test_kicks([( 1, 0), (-2, 0), ( 1,-2), (-2, 1)])
-					elif self.newshape.state == 0: # Rotation from CCW to spawn
-						if self.newshape.form > 1: # J, L, S, T, Z
-							self.test_kicks([(-1, 0), (-1, 1), ( 0,-2), (-1,-2)])
-						else: # I
-							self.test_kicks([(-2, 0), ( 1, 0), (-2,-1), ( 1, 2)])
+				# If collision occurs on basic rotation, test the kick positions.
+				self.test_kicks(kicks.tables[self.user.rotsystem]
+					[kicks.kick_class(self.freeshape.form)][self.freeshape.state][self.newshape.state])
 				if self.user.twist_flag:
 					# Wall kicks reset the gravity timer.
 					self.grav_frame = 0
 				else:
 					# If no wall kicks happened, check if this was a T-spin instead.
 					self.eval_tspin()
+			elif self.user.twist_flag:
+				# Without kicks, an obstructed rotation just doesn't happen.
+				self.test_kicks(())
 			# Update the active piece.
-			self.freeshape = self.newshape.copy()
+			self.freeshape.state = self.newshape.state
+			self.freeshape.pos = self.newshape.pos[:]
+
+	def get_placements (self, cache=None):
+		# Every distinct placement the active tetrimino can lock in from where it is now,
+		# with the shortest inputs that get it there. Refer to placements.find_placements()
+		# If a transposition table is given, the placements are looked up in it and remembered there.
+		shape = self.freeshape
+		if not self.entry_flag or shape.form > 6:
+			return [ ]
+		args = (
+			placements.Board.from_grid(self.grid), shape.form, kicks.tables[self.user.rotsystem] if self.user.enablekicks else None,
+			shape.state, shape.pos, self.floor_kick, self.user.twist_flag, self.user.tspin_flag
+		)
+		if cache is not None:
+			return placements.cached_placements(cache, *args)
+		return placements.find_placements(*args)
 
 	def eval_gravity (self):
 		# Test if the next gravity tick will cause a collision.
@@ -385,43 +385,46 @@ class Core:
 			self.shift_frame = self.shift_delay
 		# Evaluate drop score and cut piece to the matrix.
 		self.user.eval_drop_score(posdif)
-		self.grid.paste_shape(self.freeshape)
+		if any(pos[1] < 0 for pos in self.freeshape.poslist):
+			# Kicks can push a piece partly above the grid. If it locks there, the player lost.
+			self.user.state = 'loss_menu'
+		else:
+			self.grid.paste_shape(self.freeshape)
 		# Check if lines were cleared, and add the number of lines cleared to the total if any.
 		self.clearing = True
 		self.line_clearer = self.grid.clear_lines()
-		self.grid.update()
 		# Reset flags pertaining to dropped state of the tetrimino.
 		self.user.twist_flag = False
 		self.user.tspin_flag = False
 		self.entry_flag = False
 		self.entry_frame = self.entry_delay
 		# Unset active piece.
-		self.freeshape = Shape()
-		self.newshape = Shape()
-		self.ghostshape = Shape()
+		self.freeshape.set_form()
+		self.newshape.set_form()
+		self.ghostshape.set_form()
+		self.ghostkey = None
 		# Prevent a bug where losing would force pieces to spawn.
 		self.grav_frame = 0
 		if self.user.state == 'loss_menu':
 			self.grav_frame = 30
 
 	def eval_block (self):
+		# If the stack is more than a row below the shape, it can't be blocked, so there's nothing to check.
+		if self.grid.top > max(pos[1] for pos in self.freeshape.poslist) + 1:
+			return
 		# If the shape spawns on top of placed blocks, it's game over.
 		obstructed = self.check_collision(self.freeshape)
 		# If the shape did not spawn on top of blocks, see if it can move.
 		if not obstructed:
 			trapped = True
-			# Test if a line clear would be caused by the shape's initial position.
-			# I: XXXX O: OXXO T: XXXO S: XXOO Z: OXXO J: XXXO L: XXXO
-			f = self.freeshape.form
-			# Horizontal length of second row of the block - 1
-			rlen = 3 if f == 0 else 2 if f == 2 or f > 4 else 1
-			# Leftmost block
-			bcell = 6 if f == 1 or f == 4 else 5
 			# If a line could be cleared by the shape's initial position, don't care if it's blocked.
-			for i in range(2, 12):
-				if (i < bcell or i > bcell + rlen) and self.grid[1][i] is None:
-					break
-			else: trapped = False
+			# The grid counts the blocks in every row, so it's a matter of adding the shape's.
+			fills = { }
+			for pos in self.freeshape.poslist:
+				if pos[1] >= 0:
+					fills[pos[1]] = fills.get(pos[1], self.grid.fills[pos[1]]) + 1
+			if 10 in fills.values():
+				trapped = False
 			if trapped: # Can it move down?
 				self.newshape.translate(( 0, 1))
 				trapped = self.check_collision(self.newshape)
@@ -436,9 +439,47 @@ class Core:
 			if trapped: self.user.state = 'loss_menu'	
 		else: self.user.state = 'loss_menu'
 
+	def end_replay (self):
+		# Save the replay of the game that just ended, if it was recorded and anything was actually played.
+		if self.replay is not None and len(self.replay):
+			self.replay.save()
+		self.replay = None
+
+	def start_playback (self, replay):
+		# Play a replay back instead of reading the player's input. The game starts on the next frame.
+		self.playback = replay
+		self.playback_frame = 0
+		replay.apply(self.user)
+		self.user.reset()
+		if replay.gametype == 'arcade' and replay.level > 1:
+			self.user.set_level(replay.level)
+		self.user.state = 'game'
+		self.user.resetgame = True
+
+	def end_playback (self):
+		# Report how the replay ended, then close the game.
+		print("Replay finished after {} frames: score {}, {} lines cleared.".format(
+			self.playback_frame, self.user.score, self.user.lines_cleared))
+		self.user.state = 'quit'
+
+	def end_demo (self):
+		# Stop the bot and hand control back to the player at the main menu.
+		self.end_replay()
+		self.bot = None
+		self.user.demo = False
+		self.user.reset()
+		self.user.state = 'main_menu'
+		pg.mixer.music.stop()
+
 	def eval_loss (self):
 		# When a loss occurs, compare current score to scorefile list.
-		if self.user.state == 'loss_menu':
+		if self.user.state == 'loss_menu' and self.user.demo:
+			# The bot doesn't get to put its scores up, it just plays again.
+			self.user.reset()
+			self.user.state = 'game'
+			self.user.resetgame = True
+		elif self.user.state == 'loss_menu':
+			self.end_replay()
 			# Determine game type index.
 			g = 0 if self.user.gametype == 'arcade' else 1 if self.user.gametype == 'timed' else 2
 			with fh.SFH() as sfh:
@@ -480,62 +521,118 @@ class Core:
 					self.line_frame = 180
 				elif self.user.level >= 128:
 					self.line_frame = 240
-				elif self.user.levl >= 64:
+				elif self.user.level >= 64:
 					self.line_frame = 300
 			else: self.line_frame -= 1
 
 	# Refer to env.render_text()
 	render_text = env.render_text
 
-	def display (self):
-		# Display relevant stuff.
+	def eval_hud (self):
+		# Work out the text shown around the grid, as (text, anchor point, anchor position) lines.
 		# Set reference values for easy editing.
 		lalign = 113
 		ralign = 253
 		talign = self.grid.rect.y + 177
 		spacing = 30
-		# Display current game mode.
-		self.render_text(self.user.gametype.capitalize() + ' Mode', 0xFFFFFF, midtop=(env.screct.centerx, self.grid.rect.y + 15))
-		# Display current score.
-		self.render_text('Score:', 0xFFFFFF, topleft=(lalign, talign))
-		self.render_text('{}'.format(self.user.score), 0xFFFFFF, topright=(ralign, talign + spacing))
-		# Display score from last clear.
-		self.render_text('Last Clear:', 0xFFFFFF, topleft=(lalign, talign + spacing * 2))
-		if self.clearing:
-			self.render_text('{}'.format(self.user.predict_score(False)), 0xFFFFFF, topright=(ralign, talign + spacing * 3))
-		else:
-			self.render_text('{}'.format(self.user.last_score), 0xFFFFFF, topright=(ralign, talign + spacing * 3))
-		# Display total tiles cleared.
-		self.render_text('Lines Cleared:', 0xFFFFFF, topleft=(lalign, talign + spacing * 4))
-		self.render_text('{}'.format(self.user.lines_cleared), 0xFFFFFF, topright=(ralign, talign + spacing * 5))
-		# Display game mode specific values.
+		hud = [
+			# Current game mode.
+			(self.user.gametype.capitalize() + ' Mode', 'midtop', (env.screct.centerx, self.grid.rect.y + 15)),
+			# Current score.
+			('Score:', 'topleft', (lalign, talign)),
+			('{}'.format(self.user.score), 'topright', (ralign, talign + spacing)),
+			# Score from last clear.
+			('Last Clear:', 'topleft', (lalign, talign + spacing * 2)),
+			('{}'.format(self.user.predict_score(False) if self.clearing else self.user.last_score), 'topright', (ralign, talign + spacing * 3)),
+			# Total tiles cleared.
+			('Lines Cleared:', 'topleft', (lalign, talign + spacing * 4)),
+			('{}'.format(self.user.lines_cleared), 'topright', (ralign, talign + spacing * 5)),
+		]
+		# Game mode specific values.
 		if self.user.gametype == 'arcade':
-			self.render_text('Current Level:', 0xFFFFFF, topleft=(lalign, talign + spacing * 6))
-			self.render_text('{}'.format(self.user.level), 0xFFFFFF, topright=(ralign, talign + spacing * 7))
+			hud.append(('Current Level:', 'topleft', (lalign, talign + spacing * 6)))
+			hud.append(('{}'.format(self.user.level), 'topright', (ralign, talign + spacing * 7)))
 		elif self.user.gametype == 'timed':
-			self.render_text('Time Left:', 0xFFFFFF, topleft=(lalign, talign + spacing * 6))
-			self.render_text(
+			hud.append(('Time Left:', 'topleft', (lalign, talign + spacing * 6)))
+			hud.append((
 				'{}:{:02d}:{:02d}'.format(self.user.timer // 60000, self.user.timer//1000 % 60, self.user.timer%1000 // 10),
-				0xFFFFFF, topright=(ralign, talign + spacing*7)
-			)
-
-		# Display ghost piece.
+				'topright', (ralign, talign + spacing*7)
+			))
+		hud.append(('Up Next:', 'topleft', (584, self.grid.rect.y + 60)))
+		hud.append(('Held:', 'topleft', (162, self.grid.rect.y + 60)))
+		# Current fps.
+		hud.append((str(int(round(env.clock.get_fps(), 0))), 'bottomright', (env.screct.w - 5, env.screct.h - 5)))
+		return hud
+
+	def in_danger (self):
+		# True if the stack is close enough to where pieces spawn to lose the game soon.
+		return self.grid.top <= self.danger_row
+
+	def get_danger_rect (self):
+		# Where the danger indicator is drawn, under the score.
+		return env.text_rect(self.font, 'Danger!', midtop=(183, self.grid.rect.y + 447))
+
+	def display (self, hud):
+		# Display relevant stuff.
+		for text, point, anchor in hud:
+			self.render_text(text, 0xFFFFFF, **{point: anchor})
+		if self.in_danger():
+			self.render_text('Danger!', 0xFF0000, topleft=self.get_danger_rect().topleft)
+		# Display ghost piece, and the hint next to it.
 		if self.user.showghost:
 			self.ghostshape.draw()
+		self.hintshape.draw()
 		# Display active piece.
 		if self.entry_flag and not self.clearing:
 			self.freeshape.draw()
 		# Display three next pieces.
-		self.render_text('Up Next:', 0xFFFFFF, topleft=(584, self.grid.rect.y + 60))
 		for i in range(3):
-			self.nextshapes[i].draw([592, self.grid.rect.y + 126 + (i * 87)], True)
+			self.nextshapes[i].draw([592, self.grid.rect.y + 126 + (i * 87)])
 		# Display held piece.
-		self.render_text('Held:', 0xFFFFFF, topleft=(162, self.grid.rect.y + 60))
-		if self.storedshape is not None:
-			self.storedshape.draw([158, self.grid.rect.y + 126], True)
-
-		# Show current fps.
-		self.render_text(str(int(round(env.clock.get_fps(), 0))), 0xFFFFFF, bottomright=(env.screct.w - 5, env.screct.h - 5))
+		self.storedshape.draw([158, self.grid.rect.y + 126])
+
+	def mark_dirty (self, name, key, *rects):
+		# Mark a part of the screen dirty if what it shows isn't what it showed last frame,
+		# both where it was drawn last frame and where it's drawn now.
+		last = self.drawn.get(name)
+		if last is None or last[0] != key:
+			if last is not None:
+				self.dirty.extend(last[1])
+			self.dirty.extend(rect for rect in rects if rect.w)
+			self.drawn[name] = (key, [rect for rect in rects if rect.w])
+
+	def eval_dirty (self, hud):
+		# Compare everything the game screen shows against what it showed last frame.
+		self.dirty = [ ]
+		grid = self.grid
+		# The settled blocks, which only change when the grid does or while blocks are shown falling.
+		self.mark_dirty('grid', (grid.version, grid.fall_frame if grid.falls else 0), grid.field)
+		# The line clear animation.
+		self.mark_dirty('clears', tuple((sprite.rect.y, sprite.frame) for sprite in grid.csprts), *[sprite.rect for sprite in grid.csprts])
+		# The ghost and active pieces.
+		ghost = self.ghostshape
+		if self.user.showghost:
+			self.mark_dirty('ghost', (ghost.form, ghost.state, tuple(ghost.pos)), ghost.get_rect())
+		hint = self.hintshape
+		self.mark_dirty('hint', (hint.form, hint.state, tuple(hint.pos)), hint.get_rect())
+		if self.entry_flag and not self.clearing:
+			self.mark_dirty('piece', (self.freeshape.form, self.freeshape.state, tuple(self.freeshape.pos)), self.freeshape.get_rect())
+		else:
+			self.mark_dirty('piece', None)
+		# The next and held pieces.
+		for i in range(3):
+			piece = self.nextshapes[i]
+			self.mark_dirty(('next', i), piece.form, piece.get_rect([592, self.grid.rect.y + 126 + (i * 87)]))
+		self.mark_dirty('held', self.storedshape.form, self.storedshape.get_rect([158, self.grid.rect.y + 126]))
+		# The danger indicator.
+		if self.in_danger():
+			self.mark_dirty('danger', True, self.get_danger_rect())
+		else:
+			self.mark_dirty('danger', False)
+		# Every line of text.
+		for i, (text, point, anchor) in enumerate(hud):
+			self.mark_dirty(('hud', i), text, env.text_rect(self.font, text, **{point: anchor}))
+		return self.dirty
 
 	def eval_pause (self):
 		# Pause game after evaluating frame.
@@ -543,24 +640,31 @@ class Core:
 			self.soft_drop = False
 			self.shift_dir = '0'
 			self.paused = False
-			self.pause_menu.set_bg(env.screen)
-			self.user.state = 'pause_menu'
-
-	def run (self):
-		# Runs the game loop.
+			# Replays skip over pauses, since nothing happens in the game while it's paused.
+			if self.playback is None:
+				pg.mixer.music.pause()
+				self.pause_menu.set_bg(env.screen)
+				self.user.state = 'pause_menu'
+
+	def eval_frame (self, event, time):
+		# Evaluates a single frame of game logic given the frame's input event and duration in milliseconds.
+		# Nothing in here touches the display, so it can be stepped without one.
 		if self.user.resetgame:
 			self.set_data()
 			self.user.resetgame = False
 		# Evaluate inputs and kick if necessary.
-		self.eval_input()
+		self.eval_input(event)
+		self.profiler.lap('input')
 		# Evaluate translation.
 		self.eval_shift()
+		self.profiler.lap('shift')
 		# Skip majority of game code if the lineclearer object is active- aka the Grid.clear_lines() generator.
 		if not self.clearing:
 			# If the spawn delay isn't active:
 			if self.entry_flag:
 				# Evaluate ghost tetrimino and display it.
 				self.eval_ghost()
+				self.profiler.lap('ghost')
 				# Set the gravity delay to the appropriate value depending on whether soft drop is active or not.
 				self.grav_delay = self.soft_delay if self.soft_drop else self.fall_delay
 
@@ -592,16 +696,10 @@ class Core:
 		if self.user.gametype == 'arcade':
 			self.ramp_arcade()
 		# Evaluate timer at the end of the frame.
-		self.user.eval_timer(env.clock.get_time())
-		# Evaluate special states.
-		self.eval_loss()
-		self.eval_pause()
-		# Display the background.
-		env.screen.blit(self.bg, (0, 0))
-		# Display and manage the grid.
-		self.grid.update()
-		# Display everything else.
-		self.display()
+		self.user.eval_timer(time)
+		self.profiler.lap('gravity')
+
+	def eval_clears (self):
 		# Perform clearing animation during line clears.
 		if self.clearing:
 			# Both the falling and the animation account for line clear delay.
@@ -609,8 +707,100 @@ class Core:
 				self.grid.animate_clears()
 			else:
 				self.clearing = next(self.line_clearer)
-		# Refresh screen. There is not enough fast rendering to justify using update()
-		pg.display.flip()
+
+	def tick (self):
+		# Evaluates a single fixed-length frame of game logic, taking input from the player or the replay.
+		if self.playback is not None:
+			event, time, unfocused = self.playback.frame(self.playback_frame)
+			self.playback_frame += 1
+		elif self.user.demo:
+			# The bot puts in its own input, and any key the player presses takes the game back from it.
+			for event in pg.event.get():
+				if event.type == pg.QUIT:
+					self.user.state = 'quit'
+				elif event.type == pg.KEYDOWN:
+					self.end_demo()
+			if self.user.state != 'game':
+				return
+			if self.bot is None:
+				self.bot = Bot(self)
+			# The bot waits for a new game to be set up before it starts pressing keys.
+			event = None if self.user.resetgame else self.bot.get_event()
+			if event is None:
+				event = pg.event.Event(pg.NOEVENT)
+			time, unfocused = 1000 // self.framerate, False
+		else:
+			# Every frame lasts exactly as long as the framerate says, however long it took in real time.
+			event, time, unfocused = pg.event.poll(), 1000 // self.framerate, not pg.key.get_focused()
+		self.eval_frame(event, time)
+		if unfocused:
+			# Pause game when the window loses focus.
+			self.paused = True
+		if self.replay is not None:
+			self.replay.record(event, time, unfocused)
+		if self.playback is not None and (self.user.state != 'game' or self.playback_frame == len(self.playback)):
+			self.end_playback()
+		# Evaluate special states.
+		self.eval_loss()
+		self.eval_pause()
+		self.profiler.lap('other')
+		self.eval_clears()
+		self.profiler.lap('clears')
+
+	def run (self):
+		# Runs the game loop: as many frames of game logic as the time passed calls for, then draws the last one.
+		if self.redraw:
+			# Coming back from a menu, the time spent away from the game doesn't count.
+			self.pacer.resume()
+		if self.playback is not None and any(event.type == pg.QUIT for event in pg.event.get()):
+			# Replays feed the recorded input in, and the player can only close the window.
+			self.user.state = 'quit'
+			return
+		for i in range(self.pacer.max_ticks if self.uncapped else self.pacer.advance()):
+			self.tick()
+			if self.user.state != 'game':
+				break
+		# Nothing is drawn if the game is falling behind, so it can catch up.
+		if self.user.state == 'game' and not self.redraw and self.pacer.skip_frame():
+			return
+		self.draw()
+
+	def draw (self):
+		# Draws the game screen and puts it on the display.
+		self.eval_hint()
+		hud = self.eval_hud()
+		dirty = self.eval_dirty(hud)
+		self.profiler.lap('hud')
+		# Redraw everything when coming back from a menu, when leaving for one, or if dirty rects are turned off.
+		full = self.redraw or self.user.state != 'game' or not self.user.dirtyrects
+		# Only draw inside the parts of the screen that changed. Dirty rects near each other are drawn
+		# together, but ones far apart are drawn one at a time, so nothing in between gets drawn for them.
+		clips = [None] if full else env.merge_rects(dirty)
+		if not clips:
+			# Nothing changed, but the grid still keeps its stack surface up to date.
+			clips = [pg.Rect(0, 0, 0, 0)]
+		for clip in clips:
+			env.screen.set_clip(clip)
+			# Display the background.
+			env.screen.blit(self.bg, (0, 0))
+			# Display and manage the grid.
+			self.grid.update()
+			self.profiler.lap('grid')
+			# Display everything else.
+			self.display(hud)
+			self.profiler.lap('hud')
+			if self.clearing:
+				self.grid.draw_clears()
+			self.profiler.lap('grid')
+		env.screen.set_clip(None)
+		# Refresh screen.
+		if full:
+			pg.display.flip()
+		elif dirty:
+			pg.display.update(clips)
+		self.pacer.present()
+		self.profiler.lap('flip')
+		self.redraw = self.user.state != 'game'
 
 def init (argv):
 	# Local class definition of the object that will run the game.
@@ -628,6 +818,24 @@ def init (argv):
 		loss_menu = menu.LossMenu(user)
 		main_menu = menu.MainMenu(user, score_menu)
 		game = Core(user, pause_menu, save_menu, loss_menu)
+		game.record = argv.record
+		if argv.play is not None:
+			game.start_playback(Replay.load(argv.play))
+		elif argv.demo is not None:
+			# Go straight into a game the bot plays.
+			user.gametype = argv.demo
+			user.demo = True
+			user.state = 'game'
+			user.resetgame = True
+			pg.mixer.music.play()
+		# Replays can be played back without waiting for each frame's time to pass.
+		game.uncapped = argv.uncapped and argv.play is not None
+		# The screen is drawn up to this many times a second, while the game logic keeps to its own framerate.
+		fps = 0 if game.uncapped else argv.fps
+		# Debug mode shows how long each part of a frame takes, menus included.
+		if user.debug:
+			game.profiler = Profiler()
+		profiler = game.profiler
 
 		def __str__(self):
 			# Supposed to dump the game state at the time of calling, but not yet fully implemented.
@@ -644,10 +852,15 @@ def init (argv):
 			# User state system allows menu changing to be as simple as running an eval()
 			# as long as the state name matches a menu variable name.
 			while self.user.state != 'quit':
-				env.clock.tick(50)
+				env.clock.tick(self.fps)
+				self.profiler.lap('sleep')
 				try:
 					# Catch exceptions that occur during gameplay to make debugging easier.
 					eval('self.'+self.user.state+'.run()')
+					# The game times itself, so whatever time is left over belongs to the menus.
+					self.profiler.lap('menu')
+					self.profiler.draw(env.screen)
+					self.profiler.end_frame()
 				except:
 					# Dump game state to a log, ideally using verbose __str__() methods.
 					if self.user.debug:
@@ -658,5 +871,15 @@ def init (argv):
 						print_exception(*sys.exc_info(), file=dump)
 					raise
 			# Clean up when the program ends.
+			self.game.end_replay()
+			if self.game.hints is not None:
+				self.game.hints.stop()
+			if self.user.debug:
+				print(self.game.pacer)
+				if self.game.bot is not None:
+					print(self.game.bot)
+				if self.game.hints is not None:
+					print(self.game.hints)
+				print(self.profiler)
 			env.quit()
 	return Game()
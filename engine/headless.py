@@ -0,0 +1,105 @@
+"Runs pyTetris games without drawing anything, for simulating lots of games quickly."
+try:
+	import pygame as pg
+	from engine.game import Core
+	from engine.shapes import Grid
+	from engine.userstate import User
+except ImportError:
+	print("The simulation fell over before it even started:")
+	raise
+
+# Keys that a simulated player is allowed to mash.
+play_keys = (pg.K_LEFT, pg.K_RIGHT, pg.K_DOWN, pg.K_z, pg.K_x, pg.K_SPACE, pg.K_LSHIFT)
+no_event = pg.event.Event(pg.NOEVENT)
+
+def idle_input ():
+	# Endless stream of empty frames. The pieces just fall where they spawn.
+	while True:
+		yield None
+
+def random_input (rng, rate=0.2):
+	# Endless stream of random key presses, standing in for a very bored player.
+	# Each key is held for at least a frame so DAS and soft drop get exercised too.
+	held = None
+	while True:
+		if rng.random() >= rate:
+			yield None
+		elif held is not None:
+			yield pg.event.Event(pg.KEYUP, key=held)
+			held = None
+		else:
+			held = rng.choice(play_keys)
+			yield pg.event.Event(pg.KEYDOWN, key=held)
+
+class Simulation (Core):
+	"""
+	A Core that never touches the display, the mixer, the menus or the score file.
+
+	Frames are fed from an input stream rather than the event queue, one event per frame just
+	like Core.tick(), so a game stepped here plays out frame-for-frame like it would in the window.
+	Unless told otherwise, every frame is assumed to take exactly as long as it would at the game's framerate.
+	Replays recorded in the window play back here exactly as they did there, only much faster.
+	"""
+	def __init__ (self, user=None):
+		self.user = User() if user is None else user
+		self.grid = Grid(self.user)
+		self.frame = 0 # Number of frames stepped in the current game.
+		self.set_data()
+
+	def new_game (self, gametype='free', seed=None, level=1):
+		# Reset everything for a new game of the given type, with a random seed unless one is given.
+		# Arcade games can start at a later level, which is how the garbage levels get tested.
+		self.user.reset()
+		self.user.gametype = gametype
+		if gametype == 'arcade' and level > 1:
+			self.user.set_level(level)
+		self.user.state = 'game'
+		self.user.resetgame = False
+		self.frame = 0
+		self.set_data(seed)
+
+	def eval_loss (self):
+		# Losing just stops the simulation, there's no score to save.
+		pass
+
+	def eval_pause (self):
+		# Pausing has the same effect on the game state as in the window, but never leaves the game.
+		if self.paused:
+			self.soft_drop = False
+			self.shift_dir = '0'
+			self.paused = False
+
+	def step (self, event=None, time=None, unfocused=False):
+		# Evaluate a single frame, in the same order as Core.tick().
+		if event is None:
+			event = no_event
+		if time is None:
+			time = 1000 // self.framerate
+		self.eval_frame(event, time)
+		if unfocused:
+			self.paused = True
+		if self.replay is not None:
+			self.replay.record(event, time, unfocused)
+		self.eval_pause()
+		self.eval_clears()
+		self.frame += 1
+
+	def run (self, inputs, frames=None):
+		# Step through frames from the input stream until the game ends, the stream runs dry,
+		# or the frame limit is reached. Returns the number of frames stepped.
+		for event in inputs:
+			if self.user.state != 'game' or (frames is not None and self.frame >= frames):
+				break
+			self.step(event)
+		return self.frame
+
+	def play (self, replay, frames=None):
+		# Play a replay back from the start, up to the frame limit if there is one.
+		# Returns the number of frames stepped.
+		replay.apply(self.user)
+		self.new_game(replay.gametype, replay.seed, replay.level)
+		for index in range(len(replay)):
+			if self.user.state != 'game' or (frames is not None and self.frame >= frames):
+				break
+			self.step(*replay.frame(index))
+		return self.frame
@@ -0,0 +1,224 @@
+"Contains the hint engine, which looks for the best placement in the background while the game goes on."
+try:
+	import time
+	import threading
+	import traceback
+	import engine.kicks as kicks
+	import engine.placements as placements
+	from engine.bot import Bot
+	from engine.shapes import Grid
+	from engine.userstate import User
+except ImportError:
+	print("No hints for you:")
+	raise
+
+# User state that goes into scoring a clear, and so into judging placements.
+scoring_state = ('gametype', 'level', 'cleartype', 'current_combo')
+
+class Position:
+	"""
+	A Position is the worker thread's own copy of the part of a game the bot looks at, so the game can keep
+	changing its grid and user while the search runs. The bot plays on it like it would on a Core.
+	"""
+	__slots__ = ('grid', 'user', 'danger_row')
+
+	def __init__ (self):
+		self.user = User()
+		self.grid = Grid(self.user)
+		self.danger_row = 0
+
+	def in_danger (self):
+		return self.grid.top <= self.danger_row
+
+	def restore (self, cells):
+		# Fill the grid back in from (row, column, color, linkmask) tuples.
+		grid = self.grid
+		grid.set_cells()
+		grid.csprts = [ ]
+		for i, j, color, linkmask in cells:
+			grid.place(i, j, grid.new_block([j, i], color, linkmask))
+
+class HintEngine:
+	"""
+	The HintEngine finds the best placement for the active piece, or for the held one, on a worker thread,
+	so the game never waits on it. The game hands it a snapshot of the grid, the pieces and where the active one is
+	whenever any of them change, which cancels whatever it was searching and starts it over on the new one.
+
+	The search gets better the longer it runs. It first judges every placement of the active and held pieces
+	like the bot does, then looks one piece ahead for the most promising ones, best first and in bigger and bigger
+	batches, until it's looked at all of them or the time budget runs out. The best placement found so far can be
+	asked for at any time, and the game draws it as a second ghost.
+
+	The worker only ever touches its own Position and Bot, and the game only ever hands over snapshots and reads
+	back results, which are swapped in whole, so nothing needs locking but the handover.
+	"""
+	__slots__ = (
+		'position', 'bot', 'budget', 'key', 'pending', 'result', 'stopped', 'condition', 'thread', 'searches',
+		'errors', 'turn', 'swapped', 'ahead',
+	)
+
+	def __init__ (self, budget=0.5):
+		self.position = Position()
+		self.bot = Bot(self.position)
+		self.budget = budget # Seconds a search spends looking ahead before it settles on what it has.
+		self.key = None # What the last snapshot was taken of, to tell when the game has moved on.
+		self.pending = None # Snapshot waiting to be searched.
+		self.result = None # Best placement found so far, with the key of the snapshot it's for.
+		self.stopped = False
+		self.searches = 0 # Number of searches started.
+		self.errors = 0 # Number of searches that failed.
+		# Moving the active piece around doesn't change the grid, the other pieces or how they'd do, so the
+		# worker holds on to those for as long as the turn lasts rather than working them out for every search.
+		self.turn = None # Everything but the active piece from the snapshot the position was restored from.
+		self.swapped = None # Ranked placements of the piece holding would bring in, once worked out.
+		self.ahead = { } # Value of the next piece's best placement after each (form, state, x, y) placement.
+		self.condition = threading.Condition()
+		# A daemon thread, so a game that quits without stopping it doesn't hang around waiting for it.
+		self.thread = threading.Thread(target=self.work, name='hints', daemon=True)
+		self.thread.start()
+
+	def __str__ (self):
+		return "Hint engine: {} searches started, {} failed.".format(self.searches, self.errors)
+
+	def submit (self, core):
+		# Hand a snapshot of the game to the worker if anything the search looks at has changed since the last one.
+		# This runs on the game's thread, and only copies what the search needs. Returns the snapshot's key.
+		grid = core.grid
+		shape = core.freeshape
+		user = core.user
+		# Timed games score clears by the second, so the timer only counts in whole seconds.
+		scoring = tuple((name, getattr(user, name)) for name in scoring_state) + (('timer', user.timer // 1000 * 1000),)
+		piece = (shape.form, shape.state, tuple(shape.pos), core.floor_kick, user.twist_flag, user.tspin_flag)
+		held = None if core.hold_lock else core.storedshape.form
+		nexts = tuple(piece.form for piece in core.nextshapes[:2])
+		rules = (user.enablekicks, user.rotsystem)
+		# The key holds everything the search reads, bar the blocks themselves, whose every change bumps the grid's version.
+		key = ((grid.version, held, nexts, scoring, rules, core.danger_row), piece)
+		if key == self.key:
+			return key
+		self.key = key
+		snapshot = (
+			key,
+			tuple(
+				(i, j, block.color, block.linkmask)
+				for i, row in enumerate(grid.cells[:22]) for j, block in enumerate(row) if block is not None
+			),
+			scoring,
+			core.danger_row,
+			kicks.tables[user.rotsystem] if user.enablekicks else None,
+			piece,
+			held,
+			nexts,
+		)
+		with self.condition:
+			self.pending = snapshot
+			self.condition.notify()
+		return key
+
+	def get_result (self, key):
+		# The best (form, state, x, y) placement found so far for the snapshot with the given key, or None.
+		# Until the search of a snapshot has found anything, which takes a frame at most, the best placement found
+		# earlier in the same turn stands in for it, so the hint doesn't blink out every time the piece moves.
+		# Nothing found for a different grid or different pieces is ever returned.
+		result = self.result
+		if result is None or result[0][0] != key[0]:
+			return None
+		return result[1]
+
+	def stop (self):
+		# Cancel any search and let the worker thread finish.
+		with self.condition:
+			self.stopped = True
+			self.condition.notify()
+		self.thread.join()
+
+	def cancelled (self):
+		# True once there's something newer to search, or the engine is stopping.
+		return self.pending is not None or self.stopped
+
+	def work (self):
+		# The worker thread: wait for a snapshot, search it, repeat.
+		while True:
+			with self.condition:
+				while self.pending is None and not self.stopped:
+					self.condition.wait()
+				if self.stopped:
+					return
+				snapshot = self.pending
+				self.pending = None
+			self.searches += 1
+			try:
+				self.search(snapshot)
+			except Exception:
+				# A search going wrong mustn't take the thread down with it, or hints would quietly stop for the rest
+				# of the game. Say what happened, and start the turn over, since the position may be half restored.
+				self.errors += 1
+				traceback.print_exc()
+				self.turn = None
+
+	def publish (self, key, form, placement):
+		self.result = (key, (form, placement.state, placement.x, placement.y))
+
+	def search (self, snapshot):
+		# Find the best placement for a snapshot, publishing better ones as they turn up.
+		key, cells, scoring, danger_row, table, (form, state, pos, floor_kick, twist, tspin), held, nexts = snapshot
+		start = time.perf_counter()
+		position = self.position
+		if key[0] != self.turn:
+			# Something other than the active piece changed, so start the turn over.
+			self.turn = None
+			for name, value in scoring:
+				setattr(position.user, name, value)
+			position.danger_row = danger_row
+			position.restore(cells)
+			self.turn = key[0]
+			self.swapped = None
+			self.ahead = { }
+		board = placements.Board.from_grid(position.grid)
+		bot = self.bot
+		# Every placement of the active piece from where it is, then of the piece holding would bring in from where it spawns,
+		# along with the piece that comes after each.
+		candidates = [
+			(value, placement, outcome, form, nexts[0])
+			for value, placement, outcome in bot.rank(placements.find_placements(board, form, table, state, pos, floor_kick, twist, tspin), board)
+		]
+		if held is not None:
+			swapped = held if held < 7 else nexts[0]
+			if swapped != form:
+				if self.swapped is None and not self.cancelled():
+					after = nexts[0] if held < 7 else nexts[1]
+					self.swapped = [
+						(value, placement, outcome, swapped, after)
+						for value, placement, outcome in bot.rank(placements.find_placements(board, swapped, table), board)
+					]
+				candidates.extend(self.swapped or [ ])
+		if not candidates or self.cancelled():
+			return
+		candidates.sort(key=lambda candidate: -candidate[0])
+		best = candidates[0]
+		self.publish(key, best[3], best[1])
+		# Look one piece ahead, most promising first. The next piece is judged with naive clears,
+		# since the worker's grid only ever holds the snapshot, not the boards after it.
+		weights = bot.weights
+		best_value = None
+		done = 0
+		batch = 1
+		while done < len(candidates) and time.perf_counter() - start < self.budget:
+			for value, placement, (after, lines, score), piece, following in candidates[done:done + batch]:
+				index = (piece, placement.state, placement.x, placement.y)
+				if index not in self.ahead:
+					# Let the game's thread have a go at the interpreter between candidates.
+					time.sleep(0)
+					if self.cancelled():
+						return
+					self.ahead[index] = bot.pick(placements.find_placements(after, following, table), after, 0)[0]
+				ahead = self.ahead[index]
+				if ahead is None:
+					# The next piece would have nowhere to go.
+					continue
+				total = weights['lines'] * lines + weights['score'] * score / 1000. + ahead
+				if best_value is None or total > best_value:
+					best_value = total
+					self.publish(key, piece, placement)
+			done += batch
+			batch *= 2
@@ -0,0 +1,61 @@
+"Contains the wall kick tables for every rotation system pyTetris supports."
+
+# Kick offsets are tested in order when the basic rotation of a tetrimino is obstructed.
+# Offsets are (x, y) displacements with y pointing down the grid, like everywhere else.
+# The tables are keyed by (state rotated from, state rotated to).
+
+# Super Rotation System kicks for J, L, S, T and Z.
+srs_jlstz = {
+	(0, 1): ((-1, 0), (-1,-1), ( 0, 2), (-1, 2)), # Spawn to CW
+	(1, 0): (( 1, 0), ( 1, 1), ( 0,-2), ( 1,-2)), # CW to spawn
+	(1, 2): (( 1, 0), ( 1, 1), ( 0,-2), ( 1,-2)), # CW to 180
+	(2, 1): ((-1, 0), (-1,-1), ( 0, 2), (-1, 2)), # 180 to CW
+	(2, 3): (( 1, 0), ( 1,-1), ( 0, 2), ( 1, 2)), # 180 to CCW
+	(3, 2): ((-1, 0), (-1, 1), ( 0,-2), (-1,-2)), # CCW to 180
+	(3, 0): ((-1, 0), (-1, 1), ( 0,-2), (-1,-2)), # CCW to spawn
+	(0, 3): (( 1, 0), ( 1,-1), ( 0, 2), ( 1, 2)), # Spawn to CCW
+}
+# Super Rotation System kicks for I.
+srs_i = {
+	(0, 1): ((-2, 0), ( 1, 0), (-2, 1), ( 1,-2)),
+	(1, 0): (( 2, 0), (-1, 0), ( 2,-1), (-1, 2)),
+	(1, 2): ((-1, 0), ( 2, 0), (-1,-2), ( 2, 1)),
+	(2, 1): (( 1, 0), (-2, 0), ( 1, 2), (-2,-1)),
+	(2, 3): (( 2, 0), (-1, 0), ( 2,-1), (-1, 2)),
+	(3, 2): ((-2, 0), ( 1, 0), (-2, 1), ( 1,-2)),
+	(3, 0): (( 1, 0), (-2, 0), ( 1, 2), (-2,-1)),
+	(0, 3): ((-1, 0), ( 2, 0), (-1,-2), ( 2, 1)),
+}
+# Arika's I kicks, which are symmetric about the y-axis.
+arika_i = {
+	(0, 1): ((-2, 0), ( 1, 0), ( 1,-2), (-2, 1)),
+	(1, 0): (( 2, 0), (-1, 0), ( 2,-1), (-1, 2)),
+	(1, 2): ((-1, 0), ( 2, 0), (-1,-2), ( 2, 1)),
+	(2, 1): ((-2, 0), ( 1, 0), (-2,-1), ( 1, 1)),
+	(2, 3): (( 2, 0), (-1, 0), ( 2,-1), (-1, 1)),
+	(3, 2): (( 1, 0), (-2, 0), ( 1,-2), (-2, 1)),
+	(3, 0): ((-2, 0), ( 1, 0), (-2,-1), ( 1, 2)),
+	(0, 3): (( 2, 0), (-1, 0), (-1,-2), ( 2, 1)),
+}
+# Classic Arika Rotation System kicks: one step right, then one step left. I pieces don't kick.
+ars_jlstz = dict.fromkeys(srs_jlstz, (( 1, 0), (-1, 0)))
+
+def kick_class (form):
+	# I and O pieces get their own kicks, everything else shares them.
+	return form if form < 2 else 2
+
+def gen_table (i_kicks, jlstz_kicks):
+	# Build a kick table indexed by kick class, state rotated from, then state rotated to.
+	# The O piece never kicks, and neither does any rotation that isn't in the given kicks.
+	return tuple(
+		tuple(tuple(kicks.get((old, new), ()) for new in range(4)) for old in range(4))
+		for kicks in (i_kicks, { }, jlstz_kicks)
+	)
+
+# Rotation systems selectable through User.rotsystem.
+tables = {
+	'arika': gen_table(arika_i, srs_jlstz), # SRS, but with Arika's I kicks. The default.
+	'srs': gen_table(srs_i, srs_jlstz), # Plain guideline SRS.
+	'ars': gen_table({ }, ars_jlstz), # Arika Rotation System style kicks.
+	'none': gen_table({ }, { }), # No kicks at all, like the old games.
+}
@@ -13,13 +13,20 @@ class MainMenu (env.Menu):
 
 	The player is capable of starting the game selection, viewing the high score tables, and
 	changing the options.
+
+	If the player leaves it alone for a while, the bot starts playing demo games of each type in turn
+	until a key is pressed.
 	"""
+	idle_delay = 20000 # Milliseconds without input before the demo starts.
+	demo_types = ('arcade', 'timed', 'free') # Game types the demo cycles through.
 
 	def __init__ (self, user, score_menu):
 		bg = pg.Surface((210, 300))
 		bg.fill(0x00FF00)
 		super().__init__(user, bg, midtop=(env.screct.width / 2, 250))
 		self.score_menu = score_menu
+		self.idle_time = 0 # Milliseconds spent on the menu without any input.
+		self.demo_count = 0 # Number of demos started, to pick the next game type.
 
 		hmargin = 15 # horizontal margin in pixels
 		tmargin = 20 # top margin in pixels
@@ -36,6 +43,7 @@ class MainMenu (env.Menu):
 	def eval_input (self):
 		event = super().eval_input()
 		if event.type == pg.KEYDOWN:
+			self.idle_time = 0
 			if event.key == pg.K_z or event.key == pg.K_RETURN:
 				if self.selected.action == 'play':
 					self.user.state = 'play_menu'
@@ -50,6 +58,21 @@ class MainMenu (env.Menu):
 					pass
 				elif self.selected.action == 'quit':
 					self.user.state = 'quit'
+		elif self.user.state == 'main_menu':
+			self.eval_idle()
+
+	def eval_idle (self):
+		# Start a demo game once the menu has been left alone long enough.
+		self.idle_time += env.clock.get_time()
+		if self.idle_time >= self.idle_delay:
+			self.idle_time = 0
+			self.user.reset()
+			self.user.gametype = self.demo_types[self.demo_count % len(self.demo_types)]
+			self.demo_count += 1
+			self.user.demo = True
+			self.user.state = 'game'
+			self.user.resetgame = True
+			pg.mixer.music.play()
 
 	def run (self):
 		self.menu_bg.draw(env.screen)
@@ -136,7 +159,7 @@ class HiScoreMenu (env.Menu):
 		bg = pg.Surface((700, 480))
 		bg.fill(0x40C080)
 		super().__init__(user, bg, midbottom=(env.screct.centerx, env.screct.bottom - 25))
-		self.font = pg.font.SysFont(None, 30)
+		self.font = env.get_font(30)
 
 		self.selections = [
 			[env.MenuOption(self, 'arcade', None, env.screct.topright)],
@@ -0,0 +1,287 @@
+"Works out everywhere a tetrimino can lock on the grid, and the shortest inputs that get it there."
+try:
+	from collections import deque
+	from engine.shapes import orientations, Grid, hash_rows, half_keys
+except ImportError:
+	print("Couldn't find anywhere to put the piece:")
+	raise
+
+# Inputs that make up a move sequence. Shifts and rotations are single key presses, 'down' holds
+# soft drop until the piece lands, and 'drop' is the hard drop that locks it and ends every sequence.
+moves = ('left', 'right', 'cw', 'ccw', 'down', 'drop')
+pad = 4 # Empty rows a board keeps above the grid, so pieces kicked above it don't need bounds checks.
+low_pad = 3 # Full rows a board keeps below the grid, so pieces kicked below the floor don't either.
+min_col = -3 # Leftmost column a tetrimino's position can be tested at, which is as far as a kick can take it.
+
+def gen_masks ():
+	# Row masks of every tetrimino in every state at every column from min_col to 11, shifted into place
+	# and with the padding added to their rows, as (row, mask) pairs. Columns that poke out of the sides have none.
+	table = [ ]
+	for form in range(7):
+		states = [ ]
+		for orientation in orientations[form]:
+			cols = [ ]
+			for x in range(min_col, 12):
+				if all(x + dx >= 0 and mask << x + dx <= Grid.full_row for dy, dx, mask in orientation.rowmasks):
+					cols.append(tuple((dy + pad, mask << x + dx) for dy, dx, mask in orientation.rowmasks))
+				else:
+					cols.append(None)
+			states.append(tuple(cols))
+		table.append(tuple(states))
+	return tuple(table)
+
+def gen_columns ():
+	# The same as the row masks, but as (grid column, row offset) pairs for every block.
+	return tuple(
+		tuple(
+			tuple(
+				None if cells is None else tuple((col, row - pad) for row, mask in cells for col in range(10) if mask >> col & 1)
+				for cells in cols
+			)
+			for cols in states
+		)
+		for states in masks
+	)
+
+def gen_footprints ():
+	# The cells every tetrimino in every state at every column covers, as a number that's the same for
+	# the same cells, and the offset of their top row. Different states that cover the same cells,
+	# like the I piece's flat ones, then share a footprint a row apart.
+	shapes = { }
+	return tuple(
+		tuple(
+			tuple(
+				None if cells is None else (
+					shapes.setdefault(tuple((row - cells[0][0], mask) for row, mask in cells), len(shapes)),
+					cells[0][0] - pad
+				)
+				for cells in cols
+			)
+			for cols in states
+		)
+		for states in masks
+	)
+
+def count_corners (rows, x, y):
+	# Same as Grid.count_corners(), on a board's padded rows.
+	count = 0
+	for row in (rows[y + pad - 1], rows[y + pad + 1]):
+		for col in (x - 1, x + 1):
+			if col < 0 or col > 9 or row >> col & 1:
+				count += 1
+	return count
+
+# Shifted row masks, indexed by form, state, then column - min_col.
+masks = gen_masks()
+# Block columns and row offsets, indexed the same way.
+columns = gen_columns()
+# Footprints, indexed the same way.
+footprints = gen_footprints()
+
+class Board:
+	"""
+	A Board is a compact copy of a grid's occupancy bitboard, for searching and trying out placements
+	without touching the grid, its blocks or its sprites. It's a list of row bitmasks like Grid.rows,
+	with empty rows added above the grid and full rows below it.
+
+	Boards keep the same Zobrist hash the grid does, so a board and the grid it was copied from hash
+	the same, and so do two boards that end up the same after different placements.
+	"""
+	__slots__ = ('rows', 'hash')
+
+	def __init__ (self, rows, hash=None):
+		# The rows are given the same way the grid keeps them, from the top hidden row down to the floor.
+		self.rows = [0] * pad + list(rows) + [Grid.full_row] * low_pad
+		self.hash = hash_rows(self.rows[pad:]) if hash is None else hash
+
+	def __str__ (self):
+		# The visible rows, drawn in text.
+		return "\n".join(
+			''.join('#' if row >> col & 1 else '.' for col in range(10))
+			for row in self.rows[pad + 2:pad + 22]
+		)
+
+	@classmethod
+	def from_grid (cls, grid):
+		return cls(grid.rows, grid.hash)
+
+	def copy (self):
+		board = Board((), 0)
+		board.rows = self.rows[:]
+		board.hash = self.hash
+		return board
+
+	def get_columns (self):
+		# Column bitsets of the board, with bit i set in a column if it's filled in row i of the padded rows.
+		cols = [0] * 10
+		for i, row in enumerate(self.rows):
+			if row:
+				for col in range(10):
+					if row >> col & 1:
+						cols[col] |= 1 << i
+		return cols
+
+	def get_rows (self):
+		# The rows without the padding, the same way the grid keeps them.
+		return self.rows[pad:pad + 23]
+
+	def paste (self, placement):
+		# Fill the cells a placement covers, hashing them in as they go.
+		lows, highs = half_keys
+		for row, mask in placement.get_cells():
+			self.rows[row] |= mask
+			self.hash ^= lows[row - pad][mask & 31] ^ highs[row - pad][mask >> 5]
+
+	def clear_lines (self):
+		# Take out the full rows, moving everything above them down like a naive line clear.
+		# Returns the number of rows cleared. Sticky and cascade clears aren't worked out here.
+		rows = self.rows[pad:pad + 22]
+		kept = [row for row in rows if row != Grid.full_row]
+		cleared = len(rows) - len(kept)
+		if cleared:
+			self.rows[pad:pad + 22] = [0] * cleared + kept
+			self.hash = hash_rows(self.rows[pad:])
+		return cleared
+
+class Placement:
+	"""
+	A Placement is somewhere a tetrimino can lock, and the shortest move sequence that gets it there
+	from where the search started.
+
+	The twist and T-spin flags are what the user's flags would be when it locks, which is what the
+	line clear score is multiplied by. The same cells can be reached with and without them, in which
+	case each way gets its own placement.
+	"""
+	__slots__ = ('form', 'state', 'x', 'y', 'moves', 'twist', 'tspin')
+
+	def __init__ (self, form, state, x, y, moves, twist, tspin):
+		self.form = form
+		self.state = state
+		self.x = x
+		self.y = y
+		self.moves = moves # Tuple of inputs from the moves list.
+		self.twist = twist
+		self.tspin = tspin
+
+	def __repr__ (self):
+		return "Placement({}, {}, {}, {}, {})".format("IOTSZJL"[self.form], self.state, self.x, self.y, ' '.join(self.moves))
+
+	def get_cells (self):
+		# The (board row, mask) pairs the placement fills on a Board.
+		return [(self.y + row, mask) for row, mask in masks[self.form][self.state][self.x - min_col]]
+
+	def get_poslist (self):
+		# Grid coordinates of the blocks, like Shape.poslist.
+		return [[self.x + dx, self.y + dy] for dx, dy in orientations[self.form][self.state].offsets]
+
+def cached_placements (cache, board, form, table=None, state=0, pos=(4, 1), floor_kick=True, twist=False, tspin=False):
+	# The same as find_placements(), but looked up in a transposition table first, and stored in it after.
+	# Kick tables are only ever the ones in engine.kicks, so they're told apart by identity.
+	# Boards are told apart by their hash alone, so two boards that hash the same would share placements,
+	# but with 64-bit keys that's not going to happen before the table is thrown out.
+	key = ('placements', board.hash, form, id(table), state, pos[0], pos[1], floor_kick, twist, tspin)
+	found = cache.get(key)
+	if found is None:
+		found = find_placements(board, form, table, state, pos, floor_kick, twist, tspin)
+		cache.store(key, found, cost=len(found) + 1)
+	return found
+
+def find_placements (board, form, table=None, state=0, pos=(4, 1), floor_kick=True, twist=False, tspin=False):
+	# Breadth-first search over every position a tetrimino can be moved to, following the same rules as
+	# Core.eval_input(): shifts, rotations with the wall kicks in the given table (None if kicks are off),
+	# a single upward floor kick per piece, T-spins checked on failed rotations, and soft drops.
+	# The search starts with the piece where it is, and its floor kick, twist and T-spin flags as they are.
+	# Gravity is left out, so the sequences hold as long as they're put in before the piece falls far.
+	# Returns a Placement for every distinct way the piece can lock, in order of how many inputs it takes.
+	rows = board.rows
+	cols = board.get_columns()
+	kick_table = None if table is None or form == 1 else table[form if form < 2 else 2]
+	# Every position each state and column collides at, as a bitset with bit y + pad set if it collides at y.
+	# This makes testing a position, and finding how far the piece can drop, a couple of shifts each.
+	obstructions = [ ]
+	for cells in columns[form]:
+		blocked = [ ]
+		for blocks in cells:
+			if blocks is None:
+				blocked.append(-1)
+				continue
+			bits = 0
+			for col, dy in blocks:
+				bits |= cols[col] >> dy if dy >= 0 else cols[col] << -dy
+			blocked.append(bits)
+		obstructions.append(blocked)
+	footprint = footprints[form]
+
+	x, y = pos
+	if obstructions[state][x - min_col] >> y + pad & 1:
+		return [ ]
+	# Nodes are (x, y, state, flags), where the flags are the floor kick, twist and T-spin flags in bits 2, 1 and 0.
+	start = (x, y, state, floor_kick << 2 | twist << 1 | tspin)
+	parents = {start: None} # Node each node was first reached from, and the input that did it.
+	queue = deque((start,))
+	locked = set() # Footprints and flags of every placement found so far.
+	placements = [ ]
+	turns = (('cw', 1), ('ccw', 3)) if form != 1 else () # The O piece can't rotate.
+
+	while queue:
+		node = queue.popleft()
+		x, y, state, flags = node
+		blocked = obstructions[state]
+		col = x - min_col
+		# Hard drop from here, which is where the piece locks if nothing else is done.
+		below = blocked[col] >> y + pad + 1
+		bottom = y + (below & -below).bit_length() - 1
+		shape, top = footprint[state][col]
+		# Locking with any of the piece above the grid loses the game, so those don't count.
+		if bottom + top >= 0:
+			key = (shape, bottom + top, flags & 3)
+			if key not in locked:
+				locked.add(key)
+				path = ['drop']
+				step = parents[node]
+				while step is not None:
+					path.append(step[1])
+					step = parents[step[0]]
+				placements.append(Placement(form, state, x, bottom, tuple(reversed(path)), flags & 2 == 2, flags & 1 == 1))
+		if bottom > y:
+			new = (x, bottom, state, flags)
+			if new not in parents:
+				parents[new] = (node, 'down')
+				queue.append(new)
+		if not blocked[col - 1] >> y + pad & 1:
+			new = (x - 1, y, state, flags)
+			if new not in parents:
+				parents[new] = (node, 'left')
+				queue.append(new)
+		if not blocked[col + 1] >> y + pad & 1:
+			new = (x + 1, y, state, flags)
+			if new not in parents:
+				parents[new] = (node, 'right')
+				queue.append(new)
+		for move, turn in turns:
+			turned = (state + turn) % 4
+			blocked = obstructions[turned]
+			if not blocked[col] >> y + pad & 1:
+				# The basic rotation fit, so it's not a twist.
+				new = (x, y, turned, flags & 5)
+			elif kick_table is None:
+				# Without kicks, a failed rotation only clears the twist flag.
+				new = (x, y, state, flags & 5)
+			else:
+				kicked = flags & 5
+				for dx, dy in kick_table[state][turned]:
+					if dy >= 0 or kicked & 4:
+						if dy < 0:
+							kicked &= 1
+						if not blocked[col + dx] >> y + dy + pad & 1:
+							new = (x + dx, y + dy, turned, kicked | 2)
+							break
+				else:
+					# The rotation failed, which still uses up the floor kick if one was tried and can make a T-spin.
+					if form == 2 and count_corners(rows, x, y) == 3:
+						kicked |= 1
+					new = (x, y, state, kicked)
+			if new not in parents:
+				parents[new] = (node, move)
+				queue.append(new)
+	return placements
@@ -0,0 +1,111 @@
+"Contains the frame profiler, which breaks every frame down into the time spent in each of its phases."
+try:
+	import time
+	import pygame as pg
+	from collections import deque
+	import engine.environment as env
+except ImportError:
+	print("Couldn't time how long it took to crash:")
+	raise
+
+# Phases of a frame, in the order they're shown, and the color of each one's bar.
+phases = (
+	('input', 0x00F0F0), # Reading input and evaluating it.
+	('shift', 0x4060FF), # Shifting the active piece left and right.
+	('ghost', 0xA0A0A0), # Working out where the ghost piece goes.
+	('gravity', 0xF0A000), # Gravity, spawning, arcade difficulty and the timer.
+	('clears', 0xF00000), # Stepping the line clear generator and animation.
+	('other', 0xC0C0C0), # Replay recording, losing and pausing.
+	('hud', 0xF0F000), # Working out and drawing the text and pieces around the grid.
+	('grid', 0x00F000), # Drawing the background and the grid.
+	('flip', 0xA000F0), # Presenting the frame on the display.
+	('menu', 0xF080F0), # Running whichever menu is open.
+	('sleep', 0x808080), # Waiting for the next frame in the clock tick.
+	('overlay', 0xFFFFFF), # Drawing this overlay.
+)
+
+class Profiler:
+	"""
+	The Profiler times each phase of a frame by taking a lap whenever one ends, so the time since
+	the last lap counts towards the phase just finished. Each frame's times are kept for the last
+	few frames, and shown in an overlay as a rolling average and a worst case for every phase.
+
+	When the game isn't being profiled, the null_profiler takes its place and laps cost nothing
+	more than a call to a method that does nothing.
+	"""
+	__slots__ = ('current', 'history', 'last', 'clock', 'rect', 'font')
+	scale = 0.02 # Time that fills a whole bar, in seconds. One frame of game logic at 50 fps.
+	row_height = 14 # Height of each line of the overlay.
+	bar_left = 150 # Where the bars start, from the overlay's left side.
+
+	def __init__ (self, frames=120, pos=(545, 382), clock=time.perf_counter):
+		self.current = dict.fromkeys((name for name, color in phases), 0.) # Time spent in each phase this frame.
+		self.history = dict((name, deque(maxlen=frames)) for name, color in phases) # Time spent in each phase in recent frames.
+		self.clock = clock # Monotonic clock that returns the time in seconds.
+		self.last = clock() # When the last lap was taken.
+		self.rect = pg.Rect(pos, (250, self.row_height * (len(phases) + 1) + 4)) # Where the overlay is drawn.
+		self.font = env.get_font(14)
+
+	def __str__ (self):
+		# Text dump of the same figures the overlay shows.
+		return "Frame profile over the last {} frames (average / worst in microseconds):\n".format(len(self.history['input'])) + "\n".join(
+			"{:>8}: {:>6} / {:>6}".format(name, *self.get_times(name)) for name, color in phases
+		)
+
+	def lap (self, phase):
+		# Count the time since the last lap towards the given phase.
+		now = self.clock()
+		self.current[phase] += now - self.last
+		self.last = now
+
+	def end_frame (self):
+		# Count the time spent drawing the overlay, then put the frame's times in the history.
+		self.lap('overlay')
+		for name, spent in self.current.items():
+			self.history[name].append(spent)
+			self.current[name] = 0.
+
+	def get_times (self, phase):
+		# Average and worst time spent in a phase over the last few frames, in whole microseconds.
+		times = self.history[phase]
+		if not times:
+			return 0, 0
+		return int(sum(times) / len(times) * 1000000), int(max(times) * 1000000)
+
+	def draw (self, surf):
+		# Draw the overlay on the given surface and put it on the display.
+		surf.fill(0x000000, self.rect)
+		x, y = self.rect.x + 4, self.rect.y + 2
+		width = self.rect.right - 4 - x - self.bar_left
+		self.render_text('phase (us)', 0xFFFFFF, surf, topleft=(x, y))
+		self.render_text('avg', 0xFFFFFF, surf, topright=(x + 105, y))
+		self.render_text('worst', 0xFFFFFF, surf, topright=(x + self.bar_left - 5, y))
+		for name, color in phases:
+			y += self.row_height
+			average, worst = self.get_times(name)
+			self.render_text(name, color, surf, topleft=(x, y))
+			self.render_text(str(average), 0xFFFFFF, surf, topright=(x + 105, y))
+			self.render_text(str(worst), 0xFFFFFF, surf, topright=(x + self.bar_left - 5, y))
+			# The bar fills up to the average, with a line at the worst case.
+			surf.fill(0x202020, (x + self.bar_left, y + 2, width, self.row_height - 4))
+			surf.fill(color, (x + self.bar_left, y + 2, min(average / (self.scale * 1000000), 1) * width, self.row_height - 4))
+			surf.fill(0xFFFFFF, (x + self.bar_left + min(worst / (self.scale * 1000000), 1) * (width - 1), y, 1, self.row_height))
+		pg.display.update(self.rect)
+
+	# Refer to env.render_text()
+	render_text = env.render_text
+
+class NullProfiler:
+	"Stands in for the Profiler when the game isn't being profiled, and does nothing at all."
+	__slots__ = ()
+
+	def lap (self, phase):
+		pass
+
+	def end_frame (self):
+		pass
+
+	def draw (self, surf):
+		pass
+
+null_profiler = NullProfiler()
@@ -0,0 +1,110 @@
+"Contains the replay format, which records games so they can be played back exactly as they happened."
+try:
+	import os
+	import sys
+	import json
+	import zlib
+	import array
+	import datetime
+	import pygame as pg
+except ImportError:
+	print("The tape got chewed up:")
+	raise
+
+# Keys that do anything in a game. Presses of any other key do nothing, so they aren't kept.
+replay_keys = (
+	pg.K_ESCAPE, pg.K_LEFT, pg.K_RIGHT, pg.K_DOWN, pg.K_UP, pg.K_LSHIFT, pg.K_LCTRL, pg.K_z, pg.K_x, pg.K_SPACE,
+	pg.K_0, pg.K_1, pg.K_2, pg.K_3, pg.K_4, pg.K_5, pg.K_6, pg.K_7, pg.K_8, pg.K_9,
+)
+# Every event a game reacts to. A frame's input is stored as its index in here, 0 being no event at all.
+replay_events = (pg.event.Event(pg.NOEVENT), pg.event.Event(pg.QUIT)) + tuple(
+	pg.event.Event(etype, key=key) for key in replay_keys for etype in (pg.KEYDOWN, pg.KEYUP)
+)
+event_codes = dict(((event.type, getattr(event, 'key', None)), code) for code, event in enumerate(replay_events))
+unfocused_bit = 0x80 # Set in a frame's input if the window lost focus that frame.
+
+# User settings that change how a game plays out, and so are saved along with it.
+replay_settings = ('cleartype', 'enablekicks', 'rotsystem', 'showghost', 'linktiles', 'debug')
+replay_magic = b'pyTetris replay 1\n'
+
+class Replay:
+	"""
+	A replay holds everything needed to play a single game back frame-for-frame:
+	the seed, game mode, level and settings it started with, then every frame's input and duration.
+
+	Each frame's input packs into a single byte and its duration into two, and the whole lot
+	is compressed when saved, so even a long game makes for a small file.
+	"""
+	__slots__ = ('seed', 'gametype', 'level', 'settings', 'inputs', 'times')
+
+	def __init__ (self, seed, gametype, settings, level=1):
+		self.seed = seed # Seed for the game's random number generator.
+		self.gametype = gametype # Game mode that was played.
+		self.level = level # Level the game started at. Arcade games can start later than level 1.
+		self.settings = settings # Dict of the user settings the game was played with.
+		self.inputs = bytearray() # Input event code of each frame.
+		self.times = array.array('H') # Duration of each frame in milliseconds.
+
+	def __len__ (self):
+		# Number of frames recorded.
+		return len(self.inputs)
+
+	def __repr__ (self):
+		return "<Replay of a "+self.gametype+" game with seed "+str(self.seed)+", "+str(len(self))+" frames long>"
+
+	@classmethod
+	def from_user (cls, seed, user):
+		# Start recording a game with the user's current game mode and settings.
+		return cls(seed, user.gametype, dict((name, getattr(user, name)) for name in replay_settings), user.level)
+
+	def apply (self, user):
+		# Put the user's game mode and settings back to how they were when the game was recorded.
+		# The level is put back when the game starts, since starting a game resets it.
+		user.gametype = self.gametype
+		for name, value in self.settings.items():
+			setattr(user, name, value)
+
+	def record (self, event, time, unfocused):
+		# Add a frame's input event, its duration, and whether the window was out of focus.
+		code = event_codes.get((event.type, getattr(event, 'key', None)), 0)
+		self.inputs.append((code | unfocused_bit) if unfocused else code)
+		self.times.append(min(time, 0xFFFF))
+
+	def frame (self, index):
+		# Returns the input event, duration and focus loss of the frame at the given index.
+		code = self.inputs[index]
+		return replay_events[code & ~unfocused_bit], self.times[index], bool(code & unfocused_bit)
+
+	def save (self, path=None):
+		# Write the replay to a file, by default named after the current time in the replays folder.
+		if path is None:
+			if not os.path.isdir('replays'):
+				os.makedirs('replays')
+			path = os.path.join('replays', datetime.datetime.now().strftime('%Y-%m-%d %H.%M.%S') + '.rpl')
+		header = json.dumps({'seed': self.seed, 'gametype': self.gametype, 'level': self.level, 'settings': self.settings})
+		# Frame durations are always stored little-endian.
+		times = array.array('H', self.times)
+		if sys.byteorder != 'little':
+			times.byteswap()
+		with open(path, 'wb') as rfile:
+			rfile.write(replay_magic)
+			rfile.write(header.encode('utf-8') + b'\n')
+			rfile.write(zlib.compress(bytes(self.inputs) + times.tobytes(), 9))
+		return path
+
+	@classmethod
+	def load (cls, path):
+		# Read a replay from a file.
+		with open(path, 'rb') as rfile:
+			if rfile.readline() != replay_magic:
+				raise ValueError(path + " is not a pyTetris replay.")
+			header = json.loads(rfile.readline().decode('utf-8'))
+			body = zlib.decompress(rfile.read())
+		# Replays saved before the level was recorded all started at level 1.
+		replay = cls(header['seed'], header['gametype'], header['settings'], header.get('level', 1))
+		frames = len(body) // 3
+		replay.inputs = bytearray(body[:frames])
+		replay.times.frombytes(body[frames:])
+		if sys.byteorder != 'little':
+			replay.times.byteswap()
+		return replay
@@ -2,6 +2,7 @@
 try:
 	import random
 	import operator
+	import functools
 	import itertools
 	import pygame as pg
 	import engine.environment as env
@@ -9,30 +10,53 @@ except ImportError:
 	print("Are the blocks fucking made of soap?:")
 	raise
 
+def slice_tiles (src):
+	# Slice the tileset into one subsurface per color, ghost flag and link mask, in that order.
+	# Each color has a column of normal tiles and a column of ghost tiles, with a row per link mask.
+	# Combinations the tileset doesn't have fall back to the unlinked tile, then to the normal column.
+	bounds = src.get_rect()
+	tiles = [ ]
+	for color in range(8):
+		for ghost in range(2):
+			for linkmask in range(16):
+				rect = pg.Rect(color*50 + 25*ghost, linkmask*25, 25, 25)
+				if not bounds.contains(rect):
+					rect.y = 0
+				if not bounds.contains(rect):
+					rect.x = color*50
+				tiles.append(src.subsurface(rect))
+	return tuple(tiles)
+
 class Block (env.FreeSprite):
 	"""
 	Blocks are the individual pieces that make up tetriminos and the matrix grid.
 
 	The block object supports copying of its data to other blocks.
+
+	Links are kept as a bitmask, with bits 0, 1, 2, 3 set if the block is linked U, R, D, L respectively.
+	The tileset is sliced up once, and a block's image is just the tile for its color and link mask.
 	"""
 	block_src = env.load_image('tileset.png')
+	tiles = slice_tiles(block_src)
+	link_dirs = tuple(tuple(link for link in range(4) if mask >> link & 1) for mask in range(16)) # Links in each link mask.
 
-	def __init__(self, relpos, color, links=[], ghost=False, fallen=False):
-		super().__init__(self.block_src, (0, 0, 25, 25))
+	def __init__(self, relpos, color, linkmask=0, ghost=False):
+		super().__init__(self.get_tile(color, ghost, linkmask), (0, 0, 25, 25))
 		self.relpos = relpos # Position of the block relative to a predefined point on the grid, or the "center" of the shape.
 		self.color = color # Block color.
-		self.links = links # Which direction a block is linked to. 0, 1, 2, 3, for U, R, D, L respectively.
-		self.fallen = fallen # Used by the line clear function.
-		self.update(ghost)
+		self.linkmask = linkmask # Which directions a block is linked to.
 
 	def __getattr__ (self, name):
-		if name == 'linkhash':
-			# Returns a single number representing all the links.
-			return hex(sum(map(lambda x: 2 ** x, self.links)))[2]
+		if name == 'links':
+			# List of the directions the block is linked to. 0, 1, 2, 3, for U, R, D, L respectively.
+			return list(self.link_dirs[self.linkmask])
+		elif name == 'linkhash':
+			# Returns a single hex digit representing all the links.
+			return '{:x}'.format(self.linkmask)
 
 	def __repr__ (self):
 		# eval() usable expression to create a block similar to this.
-		return "Block("+repr(self.relpos)+", "+str(self.color)+", "+repr(self.links)+")"
+		return "Block("+repr(self.relpos)+", "+str(self.color)+", "+str(self.linkmask)+")"
 
 	def __hash__ (self):
 		return object.__hash__(self)
@@ -40,20 +64,93 @@ class Block (env.FreeSprite):
 	def __eq__ (self, other):
 		# If two blocks would use the same texture they're equal regardless of other internal values.
 		if isinstance(other, Block):
-			return self.cliprect == other.cliprect
-
-	def copy (self, ghost=False, fallen=False):
-		# Create new Block object that is the same as this one.
-		return Block(self.relpos[:], self.color, self.links[:], ghost, fallen)
+			return self.image is other.image
+
+	@classmethod
+	def get_tile (cls, color, ghost, linkmask):
+		# The tile for the given color, ghost flag and link mask.
+		return cls.tiles[(color*2 + int(ghost))*16 + (linkmask if env.user.linktiles else 0)]
+
+	def reuse (self, relpos, color, linkmask=0):
+		# Turn this block into a different one, so blocks cleared off the grid can be put back in play.
+		self.relpos = relpos
+		self.color = color
+		self.linkmask = linkmask
+		self.update()
+		return self
 
 	def update (self, ghost=False):
 		# Evaluate the graphic to be used. Not much else to update in Block Sprites.
-		self.cliprect.topleft = ((self.color*50) + (25*int(ghost)), (int(self.linkhash, 16) if env.user.linktiles else 0) * 25)
+		self.image = self.get_tile(self.color, ghost, self.linkmask)
+
+class Orientation:
+	"""
+	Orientations hold the precomputed geometry of one tetrimino in one rotation state.
+
+	The offsets are the block positions relative to the shape's position, and the link masks
+	are the blocks' links packed into bits 0, 1, 2, 3 for U, R, D, L. Row masks group the offsets
+	by row into (row offset, leftmost column offset, bitmask) triples for collision checks.
+	The bottom profile holds the (column offset, row offset) of the lowest block in each column.
+	"""
+	__slots__ = ('offsets', 'linkmasks', 'links', 'rowmasks', 'bottoms')
+
+	def __init__ (self, offsets, links):
+		self.offsets = tuple(offsets)
+		self.links = tuple(tuple(sorted(blinks)) for blinks in links)
+		self.linkmasks = tuple(sum(1 << link for link in blinks) for blinks in links)
+		rowmasks = [ ]
+		for dy in sorted(set(offset[1] for offset in self.offsets)):
+			cols = [offset[0] for offset in self.offsets if offset[1] == dy]
+			rowmasks.append((dy, min(cols), sum(1 << (col - min(cols)) for col in cols)))
+		self.rowmasks = tuple(rowmasks)
+		bottoms = { }
+		for dx, dy in self.offsets:
+			if dy > bottoms.get(dx, dy - 1):
+				bottoms[dx] = dy
+		self.bottoms = tuple(sorted(bottoms.items()))
+
+	def rotated (self, form):
+		# Return the orientation a clockwise rotation away from this one.
+		if form == 1:
+			# O shapes don't need to be rotated.
+			return self
+		# The center of rotation for I shapes is at the bottom right corner of their position.
+		# Otherwise, rotate using the precalculated rotation matrix.
+		if form == 0:
+			offsets = [(1 - y, x) for x, y in self.offsets]
+		else:
+			offsets = [(-y, x) for x, y in self.offsets]
+		return Orientation(offsets, [[(link + 1) % 4 for link in blinks] for blinks in self.links])
+
+def gen_orientations ():
+	# Build the orientation table for every tetrimino in every rotation state from their spawn states.
+	# I, O, T, S, Z, J, L in order, as (offset, links) per block.
+	spawns = (
+		((-1, 0), [1]), (( 0, 0), [1, 3]), (( 1, 0), [1, 3]), (( 2, 0), [3]),
+		(( 0,-1), [1, 2]), (( 1,-1), [2, 3]), (( 1, 0), [3, 0]), (( 0, 0), [0, 1]),
+		((-1, 0), [1]), (( 0,-1), [2]), (( 1, 0), [3]), (( 0, 0), [0, 1, 3]),
+		((-1, 0), [1]), (( 0, 0), [0, 3]), (( 0,-1), [1, 2]), (( 1,-1), [3]),
+		((-1,-1), [1]), (( 0,-1), [2, 3]), (( 0, 0), [0, 1]), (( 1, 0), [3]),
+		((-1,-1), [2]), ((-1, 0), [0, 1]), (( 0, 0), [1, 3]), (( 1, 0), [3]),
+		((-1, 0), [1]), (( 0, 0), [1, 3]), (( 1, 0), [0, 3]), (( 1,-1), [2]),
+	)
+	table = [ ]
+	for form in range(7):
+		blocks = spawns[form * 4:form * 4 + 4]
+		states = [Orientation([block[0] for block in blocks], [block[1] for block in blocks])]
+		for _ in range(3):
+			states.append(states[-1].rotated(form))
+		table.append(tuple(states))
+	# Empty shapes stand in between tetriminos, and have no blocks to collide with.
+	table.append((Orientation([ ], [ ]),) * 4)
+	return tuple(table)
+
+# Orientation table, indexed by form then state.
+orientations = gen_orientations()
 
 class Shape (env.FreeGroup):
 	"""
-	Shape objects are groups of four blocks each treated as one independent structure.
-	During non-naive line clears, temporary aggregate shapes are created to handle falling of the separate block domains.
+	Shape objects are tetriminos, treated as one independent structure.
 
 	The position will always start at the left middle column, at the second invisible row from the top.
 	This position is also the center of the shape's rotation if the shape is T, S, Z, J, or L.
@@ -61,80 +158,33 @@ class Shape (env.FreeGroup):
 	If I, the position represents the topleft center block of its bounding square. If O, the position
 	represents the bottomleft corner.
 
-	If this is a temporary aggregate of blocks during clears, the position is used as a reference point for translation.
+	For tetriminos, the orientation table is the source of truth for block positions and links,
+	so rotating only changes the state, and the shape doesn't need blocks of its own at all.
+	The grid hands out blocks for a tetrimino when it gets pasted. Only empty shapes (form 7)
+	can carry arbitrary blocks.
+
+	Shapes are meant to be reused with set_form() rather than made anew for every tetrimino.
 	"""
 	def __init__ (self, form=7, state=0, pos=[4, 1], ghost=False):
 		super().__init__()
-		self.pos = pos # Center of rotation.
-		self.form = form # Tetrimino shape.
-		self.state = state # Current rotation relative to spawn rotation.
 		self.ghost = ghost # Does this shape use ghost textures?
-		if form == 0: # I
-			self.add([
-				Block([-1, 0], form, [1]),
-				Block([ 0, 0], form, [1, 3]),
-				Block([ 1, 0], form, [1, 3]),
-				Block([ 2, 0], form, [3])
-			])
-		elif form == 1: # O
-			self.add([
-				Block([ 0,-1], form, [1, 2]),
-				Block([ 1,-1], form, [2, 3]),
-				Block([ 1, 0], form, [3, 0]),
-				Block([ 0, 0], form, [0, 1])
-			])
-		elif form == 2: # T
-			self.add([
-				Block([-1, 0], form, [1]),
-				Block([ 0,-1], form, [2]),
-				Block([ 1, 0], form, [3]),
-				Block([ 0, 0], form, [0, 1, 3])
-			])
-		elif form == 3: # S
-			self.add([
-				Block([-1, 0], form, [1]),
-				Block([ 0, 0], form, [0, 3]),
-				Block([ 0,-1], form, [1, 2]),
-				Block([ 1,-1], form, [3])
-			])
-		elif form == 4: # Z
-			self.add([
-				Block([-1,-1], form, [1]),
-				Block([ 0,-1], form, [2, 3]),
-				Block([ 0, 0], form, [0, 1]),
-				Block([ 1, 0], form, [3])
-			])
-		elif form == 5: # J
-			self.add([
-				Block([-1,-1], form, [2]),
-				Block([-1, 0], form, [0, 1]),
-				Block([ 0, 0], form, [1, 3]),
-				Block([ 1, 0], form, [3])
-			])
-		elif form == 6: # L
-			self.add([
-				Block([-1, 0], form, [1]),
-				Block([ 0, 0], form, [1, 3]),
-				Block([ 1, 0], form, [0, 3]),
-				Block([ 1,-1], form, [2])
-			])
-		# Pre-rotation for non-spawn state values.
-		if state > 0:
-			if state < 3:
-				self.rotate(True)
-				if state == 2:
-					self.rotate(True)
-			else:
-				self.rotate(False)
-			self.state = state
+		self.set_form(form, state, pos)
 
 	def __getattr__ (self, name):
 		if name == 'blocks':
 			# Explicit reference to the list of blocks contained in this group.
 			return [block for block in self]
+		elif name == 'orientation':
+			# Precomputed geometry for the current rotation state.
+			return orientations[self.form][self.state]
+		elif name == 'offsets':
+			# Positions of the blocks relative to the shape's position.
+			if self.form < 7:
+				return orientations[self.form][self.state].offsets
+			return [block.relpos for block in self]
 		elif name == 'poslist':
 			# List of grid coordinates for the blocks' true positions.
-			return [[self.pos[i]+block.relpos[i] for i in range(2)] for block in self]
+			return [[self.pos[0] + offset[0], self.pos[1] + offset[1]] for offset in self.offsets]
 
 	def __str__ (self):
 		# Full debug information.
@@ -144,18 +194,15 @@ class Shape (env.FreeGroup):
 			"Block Grid Positions: "+repr(self.poslist)+"\n"
 		)
 
-	def copy (self, ghost=False):
-		# Copy this shape, creating a new Shape object in the process.
-		if self.form < 7:
-			return Shape(self.form, self.state, self.pos, ghost)
-		else:
-			dest = Shape(self.form, self.state, self.pos, ghost)
-			dest.empty()
-			for block in self: dest.add(block)
-			return dest
+	def set_form (self, form=7, state=0, pos=[4, 1]):
+		# Turn this shape into a different tetrimino, dropping any blocks it had.
+		self.empty()
+		self.pos = pos # Center of rotation.
+		self.form = form # Tetrimino shape.
+		self.state = state # Current rotation relative to spawn rotation.
 
 	def rotate (self, clockwise):
-		# SRS implementation of Tetrimino rotation. It is done relative to shape.pos unless it's an I.
+		# SRS implementation of Tetrimino rotation, using the orientation table.
 		# If clockwise parameter is True, the rotation is as named. Otherwise it's counter-clockwise.
 		# Shape.state tracks current orientation for the wall kick implementation.
 		if clockwise:
@@ -164,44 +211,138 @@ class Shape (env.FreeGroup):
 		else:
 			if self.state > 0: self.state -= 1
 			else: self.state = 3
-		# Actually rotating the shape.
-		if self.form != 1: # O shapes don't need to be rotated.
-			for block in self:
-				# Center of rotation is different for I shapes.
-				block.relpos = [block.relpos[i] - 0.5 if self.form < 1 else block.relpos[i] for i in range(2)]
-				# Apply transformation using precalculated rotation matrices.
-				if clockwise:
-					tmp = -1 * block.relpos[1], block.relpos[0]
-					block.links = [link + 1 if link < 3 else 0 for link in block.links]
-				else:
-					tmp = block.relpos[1], -1 * block.relpos[0]
-					block.links = [link - 1 if link > 0 else 3 for link in block.links]
-				block.update(self.ghost)
-				block.relpos = [int(tmp[i] + 0.5) if self.form < 1 else tmp[i] for i in range(2)]
 
 	def translate (self, disp):
 		# Move the tetrimino given a displacement.
 		self.pos = [self.pos[0]+disp[0], self.pos[1]+disp[1]]
 			
-	def draw (self, anchor=None, forced=False):
+	def get_anchor (self, anchor=None):
 		# The anchor is the coordinate of the topleft pixel of the tile represented in self.pos.
-		# Draw the tetrimino to the screen.
 		if anchor is None:
-			anchor = [275 + self.pos[0]*25, 10 + self.pos[1]*25]
-		elif forced:
-			if self.form < 1:
-				anchor[1] -= 12
-			elif self.form > 1:
-				anchor[0] += 12
-		for pos, block in zip(self.poslist, self.blocks):
-			if pos[1] > 1 or forced:
-				block.set(topleft=(anchor[0] + block.relpos[0]*block.rect.w, anchor[1] + block.relpos[1]*block.rect.h))
-				block.update(self.ghost)
-				block.draw()
+			return [275 + self.pos[0]*25, 10 + self.pos[1]*25]
+		return anchor
+
+	def get_rect (self, anchor=None):
+		# The area of the screen the tetrimino covers when drawn with the same arguments.
+		anchor = self.get_anchor(anchor)
+		rects = [
+			pg.Rect(anchor[0] + offset[0]*25, anchor[1] + offset[1]*25, 25, 25)
+			for offset in self.offsets if self.pos[1] + offset[1] > 1
+		]
+		return rects[0].unionall(rects[1:]) if rects else pg.Rect(anchor, (0, 0))
+
+	def draw (self, anchor=None):
+		# Draw the tetrimino to the screen.
+		anchor = self.get_anchor(anchor)
+		if self.form < 7:
+			# Tetrimino tiles come straight from the orientation table.
+			orientation = orientations[self.form][self.state]
+			for offset, linkmask in zip(orientation.offsets, orientation.linkmasks):
+				if self.pos[1] + offset[1] > 1:
+					env.screen.blit(Block.get_tile(self.form, self.ghost, linkmask), (anchor[0] + offset[0]*25, anchor[1] + offset[1]*25))
+		else:
+			for offset, block in zip(self.offsets, self):
+				if self.pos[1] + offset[1] > 1:
+					block.set(topleft=(anchor[0] + offset[0]*block.rect.w, anchor[1] + offset[1]*block.rect.h))
+					block.update(self.ghost)
+					block.draw()
 
 	def update (self):
 		raise NotImplementedError("Updates to shapes are handled by the free/new distinction.")
 
+class Piece:
+	"""
+	Pieces stand in for the tetriminos waiting in the queue and the hold slot.
+
+	Until a tetrimino comes into play only its form matters, so there's a single Piece per form,
+	shared by everything and never changed. Form 7 is the empty hold slot.
+	Each piece composites its preview once, and then draws it in a single blit.
+	"""
+	__slots__ = ('form', 'corner', 'previews')
+	preview_key = 0xFF00FF # Colorkey for the empty parts of previews.
+
+	def __init__ (self, form):
+		self.form = form # Tetrimino shape.
+		offsets = orientations[form][0].offsets
+		# Offset of the topleft block of the bounding box, if there are any blocks.
+		self.corner = (min(offset[0] for offset in offsets), min(offset[1] for offset in offsets)) if offsets else (0, 0)
+		self.previews = { } # Composited preview surfaces, keyed by the link texture setting.
+
+	def __repr__ (self):
+		return "pieces["+str(self.form)+"]"
+
+	def __str__ (self):
+		return "Piece "+("IOTSZJLX"[self.form])+"\n"
+
+	def get_anchor (self, anchor):
+		# The anchor is the coordinate of the topleft pixel of the tile the piece's position would be in.
+		# Pieces are nudged over so that they look centered in the preview boxes.
+		if self.form < 1:
+			return [anchor[0], anchor[1] - 12]
+		elif self.form > 1:
+			return [anchor[0] + 12, anchor[1]]
+		return anchor
+
+	def get_preview (self):
+		# Composite the whole tetrimino into one surface, or fetch it if it's been done before.
+		try:
+			return self.previews[env.user.linktiles]
+		except KeyError:
+			orientation = orientations[self.form][0]
+			left, top = self.corner
+			image = pg.Surface((
+				(max(offset[0] for offset in orientation.offsets) - left + 1) * 25,
+				(max(offset[1] for offset in orientation.offsets) - top + 1) * 25
+			))
+			image.fill(self.preview_key)
+			image.set_colorkey(self.preview_key)
+			for offset, linkmask in zip(orientation.offsets, orientation.linkmasks):
+				image.blit(Block.get_tile(self.form, False, linkmask), ((offset[0] - left)*25, (offset[1] - top)*25))
+			preview = self.previews[env.user.linktiles] = image
+			return preview
+
+	def get_rect (self, anchor):
+		# The area of the screen the preview covers when drawn at the given anchor.
+		anchor = self.get_anchor(anchor)
+		if self.form > 6:
+			return pg.Rect(anchor, (0, 0))
+		return self.get_preview().get_rect(topleft=(anchor[0] + self.corner[0]*25, anchor[1] + self.corner[1]*25))
+
+	def draw (self, anchor):
+		# Draw the preview to the screen.
+		if self.form < 7:
+			env.screen.blit(self.get_preview(), self.get_rect(anchor))
+
+# Piece flyweights, indexed by form.
+pieces = tuple(Piece(form) for form in range(8))
+
+def gen_zobrist ():
+	# Random 64-bit keys for a filled cell in every row and column above the floor, from a fixed seed so
+	# a board hashes the same every run. A board's hash is its filled cells' keys XORed together.
+	# The keys are also combined ahead of time for every pattern in each half of a row, so a whole row hashes in two lookups.
+	rng = random.Random(0x7E7215)
+	cells = tuple(tuple(rng.getrandbits(64) for col in range(10)) for row in range(22))
+	halves = tuple(
+		tuple(
+			tuple(functools.reduce(operator.xor, (keys[shift + col] for col in range(5) if mask >> col & 1), 0) for mask in range(32))
+			for keys in cells
+		)
+		for shift in (0, 5)
+	)
+	return cells, halves
+
+# Zobrist keys indexed by row then column, and the combined keys indexed by half, row, then the half's bitmask.
+cell_keys, half_keys = gen_zobrist()
+
+def hash_rows (rows):
+	# Zobrist hash of an occupancy bitboard, from the top hidden row down to the last row above the floor.
+	lows, highs = half_keys
+	value = 0
+	for j in range(22):
+		if rows[j]:
+			value ^= lows[j][rows[j] & 31] ^ highs[j][rows[j] >> 5]
+	return value
+
 class ClearSprite (env.AnimatedSprite):
 	"Sprite that performs the clearing animation."
 	src = env.load_image('clear.png', colorkey=0xFF00FF)
@@ -225,19 +366,47 @@ class Grid (env.AnimatedSprite):
 
 	The Grid object extends beyond the visible playing field 2 blocks upward and 1 downward,
 	where the upward rows are empty and the downward row is full. This minimizes the number of checks required.
+
+	Alongside the cells, the Grid keeps an occupancy bitboard with one bitmask per row, where bit i
+	is set if column i is filled. Collision and full row checks work on the bitboard, so every change
+	to the cells has to go through the methods here that keep the two in sync.
+
+	The column heights are the index of the topmost filled row in each column, 22 being an empty column,
+	and the version is bumped on every change so anything derived from the cells knows when to look again.
+	Each row also keeps a count of its filled cells and a bitmask of its grey garbage blocks.
+	The number of holes, empty cells with a filled one somewhere above them, and the top, the highest
+	row with anything in it, are kept too. Placing and removing blocks updates all of these as it goes,
+	and they're only counted again from the bitboard when whole rows move, on line clears and garbage,
+	so nothing has to scan the grid every frame to know how the stack is doing.
+	The Zobrist hash of the bitboard is kept up to date along with it, cell by cell as blocks are
+	placed and removed, so searches can tell when they've seen a board before without comparing it.
+
+	The settled blocks are drawn once to an off-screen stack surface, and only the rows that changed
+	since are drawn again, so drawing the whole stack every frame is a single blit.
 	"""
 	image = env.load_image('display.png', colorkey=0x000000)
 	rect = image.get_rect(midbottom=(env.screct.centerx, env.screct.bottom - 20))
+	field = pg.Rect(rect.centerx - 125, rect.bottom - 520, 250, 500) # The visible part of the matrix on the screen.
+	full_row = 0x3FF # Bitmask of a row with every column filled.
+	link_steps = ((-1, 0), ( 0, 1), ( 1, 0), ( 0,-1)) # Row and column steps for U, R, D, L.
+	stack_key = 0xFF00FF # Colorkey for the empty cells of the stack surface.
 
 	def __init__(self, user):
 		super().__init__(self.image, self.rect)
 		self.user = user
 		self.csprts = [ ]
+		self.cells = [ ]
+		self.spare = [ ] # Blocks that have been cleared off the grid, ready to be reused.
+		self.rng = random.Random() # Picks where the holes in garbage rows go. The game shares its own with the grid.
+		self.version = 0
+		self.stack = pg.Surface(self.field.size) # Cached image of the visible settled blocks.
+		self.stack.set_colorkey(self.stack_key)
 		self.set_cells()
 
 	def __str__ (self):
 		# Dump information.
 		return (
+			"Stack Height: "+str(self.get_stack_height())+"; Holes: "+str(self.holes)+"\n"
 			"Grid Colormap and Linkmap:\n"
 			""+''.join(
 				[
@@ -266,126 +435,334 @@ class Grid (env.AnimatedSprite):
 
 	def set_cells (self):
 		# Reset Matrix.
-		self.cells = [[None if j<=21 else Block([i, j], 7, fallen=True) for i in range(10)] for j in range(23)]
+		self.spare.extend(block for row in self.cells for block in row if block is not None)
+		self.cells = [[None if j<=21 else self.new_block([i, j], 7) for i in range(10)] for j in range(23)]
+		self.rows = [0 if j<=21 else self.full_row for j in range(23)]
+		self.fills = [0 if j<=21 else 10 for j in range(23)]
+		self.greys = [0 if j<=21 else self.full_row for j in range(23)]
+		self.heights = [22 for i in range(10)]
+		self.holes = 0
+		self.top = 22
+		self.hash = 0 # Zobrist hash of the bitboard. The floor isn't hashed, so an empty grid is 0.
+		self.version += 1
+		self.stale_rows = set(range(2, 22)) # Rows whose blocks have changed since the stack surface was drawn.
+		self.falls = [ ] # Blocks still being shown falling after a cascade, with how far they fell.
+		self.fall_frame = 0 # Number of rows the falling blocks have been shown to fall so far.
+
+	def copy_from (self, grid):
+		# Fill this grid with copies of another grid's settled blocks, to try things out on without touching it.
+		self.set_cells()
+		self.csprts = [ ]
+		for i, row in enumerate(grid.cells[:22]):
+			for j, block in enumerate(row):
+				if block is not None:
+					self.place(i, j, self.new_block([j, i], block.color, block.linkmask))
+
+	def new_block (self, relpos, color, linkmask=0):
+		# Take a spare block to reuse if there is one, only making a new one otherwise.
+		if self.spare:
+			return self.spare.pop().reuse(relpos, color, linkmask)
+		return Block(relpos, color, linkmask)
+
+	def eval_stats (self):
+		# Recount the column heights, holes and top from the bitboard. There's always a full row at the bottom to stop at.
+		self.heights = [next(j for j, row in enumerate(self.rows) if row >> i & 1) for i in range(10)]
+		covered = 0
+		holes = 0
+		for row in self.rows[:22]:
+			covered |= row
+			holes += bin(covered & ~row).count('1')
+		self.holes = holes
+		self.top = min(self.heights)
+
+	def get_stack_height (self):
+		# Number of rows from the floor up to the highest block.
+		return 22 - self.top
+
+	def place (self, row, col, block):
+		# Put a block in an empty cell.
+		self.cells[row][col] = block
+		block.relpos = [col, row]
+		self.rows[row] |= 1 << col
+		self.hash ^= cell_keys[row][col]
+		self.fills[row] += 1
+		if block.color == 7:
+			self.greys[row] |= 1 << col
+		if row < self.heights[col]:
+			# Every empty cell between the column's old top and the new one is covered now.
+			self.holes += self.heights[col] - row - 1
+			self.heights[col] = row
+			if row < self.top:
+				self.top = row
+		else:
+			# Anything placed under the top of its column fills a hole.
+			self.holes -= 1
+		self.stale_rows.add(row)
+		self.version += 1
+
+	def remove (self, row, col):
+		# Empty a cell, returning the block that was in it.
+		block = self.cells[row][col]
+		self.cells[row][col] = None
+		self.rows[row] &= ~(1 << col)
+		self.hash ^= cell_keys[row][col]
+		self.fills[row] -= 1
+		self.greys[row] &= ~(1 << col)
+		self.stale_rows.add(row)
+		if row == self.heights[col]:
+			# The column's top is gone, so look down for the next filled cell.
+			# The empty cells on the way aren't covered anymore.
+			top = row
+			while not self.rows[row] >> col & 1:
+				row += 1
+			self.heights[col] = row
+			self.holes -= row - top - 1
+			if top == self.top and not self.rows[top]:
+				self.top = min(self.heights)
+		else:
+			self.holes += 1
+		self.version += 1
+		return block
+
+	def splice_row (self, index, cells, mask):
+		# Insert a row of cells at the given index, pushing the rows below it down.
+		self.cells.insert(index, cells)
+		self.rows.insert(index, mask)
+		self.fills.insert(index, bin(mask).count('1'))
+		self.greys.insert(index, sum(1 << i for i, block in enumerate(cells) if block is not None and block.color == 7))
+		self.eval_stats()
+		# Every row that moved has different keys now, so hash them all again.
+		self.hash = hash_rows(self.rows)
+		self.shift_rows(index, len(self.cells) - 1, 1)
+		self.renumber_rows(index)
+		self.version += 1
+
+	def cut_row (self, index):
+		# Delete the row at the given index, pulling the rows below it up.
+		self.rows.pop(index)
+		self.fills.pop(index)
+		self.greys.pop(index)
+		self.eval_stats()
+		self.hash = hash_rows(self.rows)
+		self.shift_rows(index + 1, len(self.cells), -1)
+		self.version += 1
+		cells = self.cells.pop(index)
+		self.renumber_rows(index)
+		if self.falls:
+			# Blocks pushed off the top can't be shown falling anymore.
+			cut = set(id(block) for block in cells if block is not None)
+			self.falls = [([block for block in blocks if id(block) not in cut], drop) for blocks, drop in self.falls]
+		return cells
+
+	def compact_rows (self, indices):
+		# Delete all of the given rows in one go, moving everything above them down to fill the gaps.
+		cut = set(indices)
+		keep = [j for j in range(len(self.cells)) if j not in cut]
+		for j in cut:
+			self.spare.extend(block for block in self.cells[j] if block is not None)
+		self.cells = [[None for i in range(10)] for j in cut] + [self.cells[j] for j in keep]
+		self.rows = [0 for j in cut] + [self.rows[j] for j in keep]
+		self.fills = [0 for j in cut] + [self.fills[j] for j in keep]
+		self.greys = [0 for j in cut] + [self.greys[j] for j in keep]
+		self.eval_stats()
+		self.hash = hash_rows(self.rows)
+		# Every row above a cut one moves down a row, so shift them one cut at a time from the top down.
+		for index in sorted(cut):
+			self.shift_rows(0, index, 1)
+		self.renumber_rows(0, max(cut) + 1)
+		self.version += 1
+
+	def renumber_rows (self, first, last=None):
+		# Tell the blocks in rows that moved which row they're in now, up to the given row or the floor.
+		# Falling blocks are drawn and marked stale by their positions, so these have to keep up with the cells.
+		# Rows only ever move up and down, and every block placed has its own position list, so only the row is set.
+		for i in range(first, len(self.cells) if last is None else last):
+			if not self.rows[i]:
+				continue
+			for block in self.cells[i]:
+				if block is not None:
+					block.relpos[1] = i
+
+	def shift_rows (self, top, bottom, dist):
+		# Move the stack surface's image of rows top to bottom - 1 by dist rows, to follow the cells moving.
+		# Rows moved in from out of sight and the rows left behind have to be drawn again.
+		self.stale_rows = {j + dist if top <= j < bottom else j for j in self.stale_rows}
+		self.stale_rows.update(range(top, top + dist) if dist > 0 else range(bottom + dist, bottom))
+		first, last = max(top, 2, 2 - dist), min(bottom, 22, 22 - dist)
+		self.stale_rows.update(j for j in range(top + dist, bottom + dist) if not first + dist <= j < last + dist)
+		if first < last:
+			# Surface.scroll() moves whatever is in the clip area, so clip it to the rows moving and where they go.
+			self.stack.set_clip(0, 25*(min(first, first + dist) - 2), 250, 25*(last - first + abs(dist)))
+			self.stack.scroll(0, 25*dist)
+			self.stack.set_clip(None)
+
+	def draw_stack (self):
+		# Draw the stale rows of settled blocks to the stack surface.
+		# Blocks shown falling are left out until the whole fall has been shown.
+		falling = set(id(block) for blocks, drop in self.falls for block in blocks)
+		for i in self.stale_rows:
+			if i < 2 or i > 21:
+				continue
+			self.stack.fill(self.stack_key, (0, 25*(i-2), 250, 25))
+			for j, block in enumerate(self.cells[i]):
+				if block is not None and id(block) not in falling:
+					self.stack.blit(block.image, (25*j, 25*(i-2)))
+		self.stale_rows = set()
+
+	def collides (self, rowmasks, x, y):
+		# Check if a tetrimino with the given row masks at (x, y) is out of bounds or overlapping filled cells.
+		rows = self.rows
+		for dy, dx, mask in rowmasks:
+			if y + dy < 0:
+				# Ideally, it's impossible to get above the grid, but just in case...
+				continue
+			elif x + dx < 0 or y + dy > 22:
+				return True
+			mask <<= x + dx
+			if mask > self.full_row or rows[y + dy] & mask:
+				return True
+		return False
+
+	def count_corners (self, x, y):
+		# Number of the four cells diagonal to (x, y) that are filled, with the walls counting as filled.
+		count = 0
+		for row in (y - 1, y + 1):
+			for col in (x - 1, x + 1):
+				if col < 0 or col > 9 or (row >= 0 and self.rows[row] >> col & 1):
+					count += 1
+		return count
+
+	def drop_distance (self, orientation, x, y):
+		# Number of rows a tetrimino in the given orientation at (x, y) can fall before landing on something.
+		# If the tetrimino is above the stack, that's the smallest gap between its bottom and the column heights.
+		dist = None
+		for dx, dy in orientation.bottoms:
+			if x + dx < 0 or x + dx > 9:
+				return 0
+			gap = self.heights[x + dx] - y - dy - 1
+			if gap < 0:
+				# It's tucked under an overhang, so the column heights are no help here.
+				return self.scan_drop(orientation.rowmasks, x, y)
+			if dist is None or gap < dist:
+				dist = gap
+		return 0 if dist is None else dist
+
+	def scan_drop (self, rowmasks, x, y):
+		# Work out the drop distance by stepping the row masks down the bitboard.
+		masks = [ ]
+		for dy, dx, mask in rowmasks:
+			if x + dx < 0 or mask << x + dx > self.full_row:
+				return 0
+			masks.append((y + dy + 1, mask << x + dx))
+		rows = self.rows
+		dist = 0
+		while True:
+			for row, mask in masks:
+				# The floor row is full, so this always stops before running off the grid.
+				if row + dist >= 0 and rows[row + dist] & mask:
+					return dist
+			dist += 1
 
 	def add_garbage (self):
 		# Adds a garbage row.
-		hole = random.randrange(10)
-		garbage = [None if i == hole else Block([i, 22], 7, fallen=True) for i in range(10)]
-		# Link up the garbage blocks.
-		for i, block in enumerate(garbage):
-			# For some reason this will not work with a list comprehension.
-			links = [ ]
-			if i != hole:
-				if i != 0 and i != hole + 1:
-					links.append(3)
-				if i != 9 and i != hole - 1:
-					links.append(1)
-				block.links = links
-				block.update()
-		self.cells.insert(22, garbage)
-		self.cells.pop(0)
-		self.update()
-
-	def paste_shape (self, shape, fallen=False):
+		hole = self.rng.randrange(10)
+		garbage = [ ]
+		for i in range(10):
+			if i == hole:
+				garbage.append(None)
+				continue
+			# Link up the garbage blocks to their left and right neighbours, if they have any.
+			linkmask = 0
+			if i != 0 and i != hole + 1:
+				linkmask |= 8
+			if i != 9 and i != hole - 1:
+				linkmask |= 2
+			garbage.append(self.new_block([i, 22], 7, linkmask))
+		self.splice_row(22, garbage, self.full_row & ~(1 << hole))
+		self.spare.extend(block for block in self.cut_row(0) if block is not None)
+
+	def paste_shape (self, shape):
 		# Paste a shape to this grid.
-		for pos, block in zip(shape.poslist, shape):
+		# Tetriminos don't have blocks of their own, so they're given blocks with their links once they're set in place.
+		if shape.form < 7:
+			blocks = [self.new_block(pos, shape.form, linkmask) for pos, linkmask in zip(shape.poslist, shape.orientation.linkmasks)]
+		else:
+			blocks = list(shape)
+		for pos, block in zip(shape.poslist, blocks):
 			assert self[pos[1]][pos[0]] is None, "Collision check failure! You done fucked up, bro!"
-			self[pos[1]][pos[0]] = block
-			block.relpos = pos
-			if fallen: block.fallen = True
-
-	def flood_fill (self, t_shape, index):
-		# Recursive blind flood fill function.
-		if self[index[0]][index[1]] is not None and index[0] < 22:
-			# Reset the block's position.
-			self[index[0]][index[1]].relpos = [index[1] - 4, index[0] - 1]
-			# Add the block to the temporary shape.
-			t_shape.add(self[index[0]][index[1]])
-			# Remove the block from the grid.
-			self[index[0]][index[1]] = None
-			# Look at every nearby cell and perform again if valid.
-			self.flood_fill(t_shape, (index[0] - 1, index[1])) # Up
-			self.flood_fill(t_shape, (index[0], index[1] + 1)) # Right
-			self.flood_fill(t_shape, (index[0] + 1, index[1])) # Down
-			self.flood_fill(t_shape, (index[0], index[1] - 1)) # Left
-
-	def link_fill (self, t_shape, index):
-		# Recursive flood fill function using the links.
-		if self[index[0]][index[1]] is not None and index[0] < 22:
-			# Reset the block's position.
-			self[index[0]][index[1]].relpos = [index[1] - 4, index[0] - 1]
-			# Add the block to the temporary shape.
-			t_shape.add(self[index[0]][index[1]])
-			# Save links to temporary variable before deleting the block.
-			oldlinks = self[index[0]][index[1]].links
-			# Remove the block from the grid.
-			self[index[0]][index[1]] = None
-			# Check adjacent blocks as indicated by the links.
-			if 0 in oldlinks: # Up
-				self.link_fill(t_shape, (index[0] - 1, index[1]))
-			if 1 in oldlinks: # Right
-				self.link_fill(t_shape, (index[0], index[1] + 1))
-			if 2 in oldlinks: # Down
-				self.link_fill(t_shape, (index[0] + 1, index[1]))
-			if 3 in oldlinks: # Left
-				self.link_fill(t_shape, (index[0], index[1] - 1))
-
-	def cascade (self, base_row):
-		# Drop floating blocks during non-naive line clear methods.
-		# Set the fallen flag of all blocks above and one row below to False, which means they're 'floating'.
-		for row in self[:base_row + 2]:
-			for block in row:
-				if block is not None and block.color != 7:
-					block.fallen = False
-		# For each row, cut a set of temporary shapes from it to allow to fall.
-		locked_shapes = True
-		while locked_shapes:
-			for row in self[::-1]:
-				# locked_shapes is True when one of the shapes in the row is blocked from falling by another shape.
-				locked_shapes = False
-				tempshapes = [ ]
-				for block in row:
-					# Add blocks that both exist and have not fallen yet.
-					if block is None or block.fallen:
-						continue
-					# Create new blank temporary shape.
-					tempshape = Shape()
-					# Cut connected blocks from grid to the shape.
-					if self.user.cleartype == 1:
-						# Perform a blind flood fill if the method is sticky.
-						self.flood_fill(tempshape, block.relpos[::-1])
-					elif self.user.cleartype == 2:
-						# Perform a flood fill considering which blocks are linked if the method is cascade.
-						self.link_fill(tempshape, block.relpos[::-1])
-					for block in tempshape:
-						# If the block being tested isn't connected to the block below it, then the shape it's a part of is blocked.
-						if (self.user.cleartype == 1
-							or (2 not in block.links and self[block.relpos[1] + 2][block.relpos[0] + 4] is not None)):
-							locked_shapes = True
-							# Cut the shape back to the matrix.
-							self.paste_shape(tempshape)
-							break
-					# Add this temprary shape to the list if it's not blocked.
-					else: tempshapes.append(tempshape)
-				# If there is at least one temporary shape created, move them all down one space.
-				if not len(tempshapes):
+			self.place(pos[1], pos[0], block)
+
+	def label_components (self, base_row):
+		# Label the floating components above base_row in one pass, as lists of cell indices (row * 10 + column).
+		# Sticky clears group blocks by the sides they share, cascade clears follow the blocks' own links.
+		# Grey blocks never float, and sticky groups touching them stay put too, so they aren't returned.
+		sticky = self.user.cleartype == 1
+		top = min(base_row + 1, 21)
+		seen = set()
+		components = [ ]
+		# Scan upwards from the bottom, so components come out in the order they'd land in.
+		for row in range(top, -1, -1):
+			for col in range(10):
+				block = self.cells[row][col]
+				if block is None or block.color == 7 or row * 10 + col in seen:
 					continue
-				for shape in tempshapes:
-					shape.translate(( 0, 1))	
-					# Test if moving down one space causes a collision.
-					for pos, block in zip(shape.poslist, shape):
-						if self[pos[1]][pos[0]] is None:
+				seen.add(row * 10 + col)
+				stack = [row * 10 + col]
+				cells = [ ]
+				anchored = False
+				while stack:
+					index = stack.pop()
+					cells.append(index)
+					i, j = divmod(index, 10)
+					block = self.cells[i][j]
+					for link in (range(4) if sticky else Block.link_dirs[block.linkmask]):
+						k, l = i + self.link_steps[link][0], j + self.link_steps[link][1]
+						if k < 0 or k > 21 or l < 0 or l > 9 or k * 10 + l in seen or self.cells[k][l] is None:
 							continue
-						# Move it back up one space when a collision has been detected.
-						shape.translate(( 0,-1))
-						# If it collided with a fallen block, then the shape has fallen. Copy it back to the matrix.
-						if self[pos[1]][pos[0]].fallen:
-							self.paste_shape(shape, True)
-							break
-					else:
-						# If it either did not collide, or collided with another floating shape, copy it to the tempgrid instead.
-						self.tempgrid.append(shape)			
+						if sticky and (k > top or self.cells[k][l].color == 7):
+							# Sticky groups hang on to the settled stack and garbage they touch.
+							anchored = True
+							continue
+						seen.add(k * 10 + l)
+						stack.append(k * 10 + l)
+				if not anchored:
+					components.append(cells)
+		return components
+
+	def cascade (self, components):
+		# Drop every floating component straight down to where it comes to rest, instead of a row at a time.
+		# Components are settled from the bottom up against whatever is under them. If one was held up
+		# by a component that only fell later, another pass lets it catch up.
+		# The components' cell indices are moved along with them. Returns how far each one fell.
+		drops = [0 for cells in components]
+		# Take them in the order a scan up the rows would find them, by lowest row then leftmost column.
+		order = sorted(range(len(components)), key=lambda n: min((-(i // 10), i % 10) for i in components[n]))
+		fell = True
+		while fell:
+			fell = False
+			for n in order:
+				cells = components[n]
+				members = set(cells)
+				# The component can fall as far as the smallest gap under its blocks.
+				# Gaps that end on the component itself don't count, as that part falls along with it.
+				dist = 22
+				for i in cells:
+					if i + 10 in members:
+						continue
+					row, col = divmod(i + 10, 10)
+					while not self.rows[row] >> col & 1:
+						row += 1
+					if row * 10 + col not in members:
+						dist = min(dist, row - i // 10 - 1)
+				if not dist:
+					continue
+				blocks = [self.remove(*divmod(i, 10)) for i in cells]
+				for m, block in enumerate(blocks):
+					cells[m] += dist * 10
+					self.place(cells[m] // 10, cells[m] % 10, block)
+				drops[n] += dist
+				fell = True
+		return drops
 
 	def clear_lines (self):
 		"""
@@ -406,70 +783,83 @@ class Grid (env.AnimatedSprite):
 			cleared = False	
 			# Set base_row, which is the lowest row a line clear occurs in, to the top row.
 			base_row = 0
-			# Test if there is a full row, checking upwards, then clear all of them.
+			# Rows to be spliced out once every full row has been dealt with.
+			cut = [ ]
+			# The fill counts say which rows are full, so clear all of them, checking upwards.
 			for i in range(21, -1, -1):
 				# If at least one block is empty, the row is not full.
-				if all(self[i]):
-					# Add a ClearSprite to show the row being cleared.
-					self.csprts.append(ClearSprite(bottomleft=(self.rect.centerx - 125, self.rect.bottom - 20 + 25*(i-21))))
+				if self.fills[i] == 10:
 					# If at least one block is grey between the first two visible blocks, it must be a garbage row.
-					garbagerow = env.cond_any(self[i][:2], lambda b:b.color == 7)
-					# Increment the cleared lines counter.
-					self.user.line_list[-1] += 1
+					garbagerow = self.greys[i] & 0b11 != 0
 					cleared = True
 					# If a line is full below the indicated base_row, set base_row to that row.
 					if i > base_row: base_row = i
 					# Remove the links that point to blocks that are to be cleared.
 					for j in range(10):
 						# Remove upward links from blocks below.
-						if self[i + 1][j] is not None and 2 in self[i][j].links:
-							self[i + 1][j].links.remove(0)
+						if self[i + 1][j] is not None and self[i][j].linkmask & 4:
+							self[i + 1][j].linkmask &= ~1
 							self[i + 1][j].update()
+							self.stale_rows.add(i + 1)
 						# Remove downward links from blocks above.
-						if self[i - 1][j] is not None and 0 in self[i][j].links:
-							self[i - 1][j].links.remove(2)
+						if self[i - 1][j] is not None and self[i][j].linkmask & 1:
+							self[i - 1][j].linkmask &= ~4
 							self[i - 1][j].update()
-						# Just leave the row empty if the method is sticky or cascade.
-						if self.user.cleartype > 0: self[i][j] = None
-					# Splice the old row out and create a new blank row on top if method is naive or when clearing a garbage row.
+							self.stale_rows.add(i - 1)
+					# Splice the old row out if method is naive or when clearing a garbage row.
 					if self.user.cleartype < 1 or garbagerow:
-						# Delete the old row.
-						self.cells.pop(i)
-						# Create new blank row at the top.
-						self.cells.insert(0, [None for i in range(10)])
-						# Force the game to look through all the rows again to avoid skipping lines.
-						break
+						cut.append(i)
+					# Just leave the row empty if the method is sticky or cascade.
+					else:
+						# Add a ClearSprite to show the row being cleared, and increment the cleared lines counter.
+						self.csprts.append(ClearSprite(bottomleft=(self.rect.centerx - 125, self.rect.bottom - 20 + 25*(i-21))))
+						self.user.line_list[-1] += 1
+						for j in range(10): self.spare.append(self.remove(i, j))
+			# Delete all of the spliced rows at once, creating new blank rows on top.
+			if cut: self.compact_rows(cut)
 			# If a line has been cleared, let the floating blocks fall until they collide with other blocks.
 			if not cleared:
 				continue
-			yield True
+			# Spliced rows are still shown being cleared one at a time, lowest first, each getting the clear animation
+			# to itself. Each one flashes where it would be once the rows below it were gone.
+			for n, i in enumerate(cut):
+				self.csprts.append(ClearSprite(bottomleft=(self.rect.centerx - 125, self.rect.bottom - 20 + 25*(i+n-21))))
+				self.user.line_list[-1] += 1
+				yield True
+			if not cut:
+				yield True
 			# If the method is naive, then don't proceed.
 			if self.user.cleartype < 1:
 				continue
-			while True:
-				# Tempgrid is the list of all shapes that have not fallen all the way down yet.
-				self.tempgrid = [ ]
-				# Drop all floating pieces via the tempgrid.
-				self.cascade(base_row)
-				# Copy all of the tempgrid's shapes back to the matrix.
-				if len(self.tempgrid) > 0:
-					for shape in self.tempgrid:
-						self.paste_shape(shape)
-					# Display intermediate drops so the user can see the combo, via doing this as a coroutine.
-					yield True
-				else: break
+			# Find the floating components, then drop them all the way down at once.
+			components = self.label_components(base_row)
+			drops = self.cascade(components)
+			# Keep the falling blocks around, so the fall can still be shown a row at a time.
+			self.falls = [([self.cells[i // 10][i % 10] for i in cells], drop) for cells, drop in zip(components, drops) if drop]
+			for frame in range(1, max(drops, default=0) + 1):
+				self.fall_frame = frame
+				# Display intermediate drops so the user can see the combo, via doing this as a coroutine.
+				yield True
+			# The fallen blocks go back to being drawn with the rest of the stack.
+			for blocks, drop in self.falls:
+				self.stale_rows.update(block.relpos[1] for block in blocks)
+			self.falls = [ ]
 			self.user.line_list.append(0)
-			# If the tempgrid list is empty, that means that all the blocks have fallen. Check if the fallen blocks caused another line clear.
+			# Once nothing falls anymore, check if the fallen blocks caused another line clear.
 		# Evaluate score from the last clear.
 		# If at least one block remains on the bottom, then the grid has not completely cleared.
-		self.user.eval_clear_score(not any(self[21]))
+		self.user.eval_clear_score(not self.rows[21])
 		# Once done clearing lines, set the clearing flag to False to prevent the StopIteration exception from being raised.
 		yield False
 
-	def animate_clears (self):
-		# Animate and draw the ClearSprite objects.
+	def draw_clears (self):
+		# Draw the ClearSprite objects.
 		for sprite in self.csprts:
 			sprite.draw()
+
+	def animate_clears (self):
+		# Advance the ClearSprite animations, dropping them all once they're done.
+		for sprite in self.csprts:
 			try:
 				sprite.animate()
 			except StopIteration:
@@ -479,9 +869,15 @@ class Grid (env.AnimatedSprite):
 	def update (self):
 		# Display the grid background and constituent blocks.
 		self.draw()
-		for i, row in enumerate(self[2:22], 2):
-			for j, block in enumerate(row):
-				if block is None:
+		if self.stale_rows:
+			self.draw_stack()
+		env.screen.blit(self.stack, self.field)
+		# Blocks that are still being shown falling are drawn above where they settled.
+		# The grid settles in one go, so this is only worked out when the fall is actually drawn.
+		for blocks, drop in self.falls:
+			for block in blocks:
+				j, k = block.relpos[0], block.relpos[1] - max(drop - self.fall_frame, 0)
+				if k < 2:
 					continue
-				block.set(bottomleft=(self.rect.centerx + block.rect.w*(j-5), self.rect.bottom - 20 + block.rect.h*(i-21)))
+				block.set(bottomleft=(self.rect.centerx + block.rect.w*(j-5), self.rect.bottom - 20 + block.rect.h*(k-21)))
 				block.draw()
@@ -0,0 +1,94 @@
+"Contains the transposition table, which remembers search results for positions that keep coming up."
+try:
+	import itertools
+	from collections import OrderedDict
+except ImportError:
+	print("Forgot everything it was supposed to remember:")
+	raise
+
+class TranspositionTable:
+	"""
+	The TranspositionTable remembers search results, like the placements found for a piece or how good
+	a board turned out to be, keyed by anything hashable. Keys usually start with a board's Zobrist hash,
+	so the same position reached through different moves only gets searched once.
+
+	Every entry costs as much as it's told it does, like the number of placements stored in it, and the
+	table never holds more than its capacity. That caps the memory it takes up rather than just the number of entries.
+	When it's full, the least recently used entry is thrown out. With a window bigger than one, the entry that
+	came from the shallowest search out of that many least recently used ones is thrown out instead, so results that
+	took deeper searches to find stay around longer.
+
+	The hit and miss counters are there to tune the capacity and window with.
+	"""
+	__slots__ = ('entries', 'capacity', 'window', 'used', 'hits', 'misses', 'evictions')
+
+	def __init__ (self, capacity=1 << 16, window=1):
+		self.entries = OrderedDict() # Values with their depth and cost, from least to most recently used.
+		self.capacity = capacity # Total cost of the entries the table can hold.
+		self.window = window # Number of least recently used entries eviction picks the shallowest from.
+		self.used = 0 # Total cost of the entries held.
+		self.reset_counters()
+
+	def __len__ (self):
+		return len(self.entries)
+
+	def __contains__ (self, key):
+		# Checking for a key doesn't count as a hit or a miss, or as using it.
+		return key in self.entries
+
+	def __str__ (self):
+		return "Transposition table: {} entries costing {} of {}, {} hits and {} misses ({:.1%} hit rate), {} evicted.".format(
+			len(self.entries), self.used, self.capacity, self.hits, self.misses, self.get_hit_rate(), self.evictions
+		)
+
+	def reset_counters (self):
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get_hit_rate (self):
+		# Fraction of lookups that found something.
+		lookups = self.hits + self.misses
+		return self.hits / lookups if lookups else 0.
+
+	def get (self, key, depth=0):
+		# The value stored for a key, as long as it came from a search at least as deep as asked for. None otherwise.
+		entry = self.entries.get(key)
+		if entry is None or entry[1] < depth:
+			self.misses += 1
+			return None
+		self.entries.move_to_end(key)
+		self.hits += 1
+		return entry[0]
+
+	def store (self, key, value, depth=0, cost=1):
+		# Remember a value for a key, unless what's already stored for it came from a deeper search.
+		old = self.entries.get(key)
+		if old is not None:
+			if old[1] > depth:
+				self.entries.move_to_end(key)
+				return
+			del self.entries[key]
+			self.used -= old[2]
+		if cost > self.capacity:
+			# It'd push everything else out and still not fit.
+			return
+		self.entries[key] = (value, depth, cost)
+		self.used += cost
+		while self.used > self.capacity:
+			self.evict()
+
+	def evict (self):
+		# Throw out the least recently used entry, or the shallowest of the least recently used ones in the window.
+		if self.window > 1:
+			key = min(itertools.islice(self.entries, self.window), key=lambda key: self.entries[key][1])
+			value, depth, cost = self.entries.pop(key)
+		else:
+			key, (value, depth, cost) = self.entries.popitem(last=False)
+		self.used -= cost
+		self.evictions += 1
+
+	def clear (self):
+		# Forget everything, but keep counting.
+		self.entries.clear()
+		self.used = 0
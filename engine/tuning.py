@@ -0,0 +1,197 @@
+"Tunes the bot's weights and the scoring constants by playing lots of headless games across a pool of processes."
+try:
+	import os
+	import json
+	import math
+	import time
+	import random
+	from concurrent.futures import ProcessPoolExecutor, as_completed
+	from engine.bot import Bot, default_weights
+	from engine.userstate import User
+except ImportError:
+	print("The tuner went out of tune:")
+	raise
+
+# Scoring constants of the User class that can be tuned alongside the bot's weights.
+score_constants = (
+	'drop_score', 'dist_factor', 'line_score', 'line_factor', 'cascade_factor',
+	'twist_factor', 'tspin_factor', 'combo_factor', 'clear_factor',
+)
+default_constants = {name: getattr(User, name) for name in score_constants}
+# What a game is judged by: lines cleared or the score, within the frame limit.
+fitnesses = ('lines', 'score')
+
+# Each worker process keeps its own simulation around, rather than building one for every game.
+simulation = None
+
+def play_game (params, gametype, seed, frames, level=1, fitness='lines'):
+	# Play a single seeded game with the bot, using the given weights and scoring constants over the defaults.
+	# This runs in the worker processes, so it only takes and returns things that can be pickled.
+	# Returns the fitness of the game, with the frames and placements it took.
+	global simulation
+	if simulation is None:
+		import engine.headless as headless
+		simulation = headless.Simulation()
+	# Scoring constants live on the User class, and each worker has its own copy of it.
+	for name in score_constants:
+		setattr(User, name, params.get(name, default_constants[name]))
+	weights = dict(default_weights)
+	weights.update((name, value) for name, value in params.items() if name in weights)
+	simulation.new_game(gametype, seed, level)
+	bot = Bot(simulation, weights)
+	simulation.run(bot.inputs(), frames)
+	user = simulation.user
+	return (user.lines_cleared if fitness == 'lines' else user.score), simulation.frame, bot.placed
+
+class Tuner:
+	"""
+	The Tuner searches for the weights and scoring constants that get the bot the most lines, or score,
+	per game. It's a cross-entropy search, a simpler, diagonal cousin of CMA-ES: every generation, a
+	population of candidates is drawn around the mean, each plays the same seeded games, and the mean and
+	spread of every parameter move towards the best half of them, the better ones counting for more.
+
+	Every game of every candidate is a separate job for the process pool, so the work spreads out evenly
+	however many cores there are, and results are added up as they come in rather than a generation at a time.
+	The whole state, random number generator included, is saved to a checkpoint file every so often and after
+	every generation, and a tuner loaded from it carries on with exactly the games that hadn't finished.
+	"""
+	__slots__ = (
+		'params', 'mean', 'sigma', 'gametype', 'games', 'frames', 'level', 'fitness', 'population',
+		'generation', 'rng', 'candidates', 'seeds', 'results', 'best', 'history',
+	)
+	smoothing = 0.7 # How far the mean and spread move towards the best candidates each generation.
+	min_sigma = 0.01 # Smallest spread any parameter can have, relative to its mean.
+
+	def __init__ (self, params, gametype='free', games=4, frames=6000, level=1, fitness='lines', population=16, sigma=0.3, seed=None):
+		for name in params:
+			if name not in default_weights and name not in score_constants:
+				raise ValueError("Can't tune " + name + ", it isn't a bot weight or a scoring constant.")
+		if fitness not in fitnesses:
+			raise ValueError("Can't judge games by " + fitness + ".")
+		self.params = list(params)
+		self.mean = [default_weights[name] if name in default_weights else default_constants[name] for name in self.params]
+		self.sigma = [sigma * max(abs(value), 0.1) for value in self.mean]
+		self.gametype = gametype
+		self.games = games # Games every candidate plays each generation.
+		self.frames = frames # Most frames a game lasts.
+		self.level = level # Level arcade games start at.
+		self.fitness = fitness
+		self.population = population # Candidates each generation.
+		self.generation = 0
+		self.rng = random.Random(seed)
+		self.best = None # Best candidate so far, with its fitness.
+		self.history = [ ] # Mean and best fitness of every generation.
+		self.new_generation()
+
+	def __str__ (self):
+		return "Generation {}: ".format(self.generation) + ', '.join(
+			"{} {:.4g} (+-{:.2g})".format(name, mean, sigma) for name, mean, sigma in zip(self.params, self.mean, self.sigma)
+		)
+
+	def new_generation (self):
+		# Draw the candidates and seeds for the next generation. Every candidate plays the same games,
+		# so they're only told apart by how they play, not by what pieces they get.
+		self.candidates = [
+			[self.rng.gauss(mean, sigma) for mean, sigma in zip(self.mean, self.sigma)]
+			for i in range(self.population)
+		]
+		for candidate in self.candidates:
+			for i, name in enumerate(self.params):
+				# Scoring constants can't go negative.
+				if name in score_constants and candidate[i] < 0:
+					candidate[i] = 0.
+		self.seeds = [self.rng.randrange(1 << 32) for i in range(self.games)]
+		self.results = [[None] * self.games for i in range(self.population)]
+
+	def get_jobs (self):
+		# Arguments to play_game() for every game of this generation that hasn't finished yet, with where its result goes.
+		return [
+			((c, g), (dict(zip(self.params, candidate)), self.gametype, seed, self.frames, self.level, self.fitness))
+			for c, candidate in enumerate(self.candidates)
+			for g, seed in enumerate(self.seeds)
+			if self.results[c][g] is None
+		]
+
+	def get_fitness (self, c):
+		# Mean fitness of a candidate over its games.
+		return sum(self.results[c]) / self.games
+
+	def update (self):
+		# Move the mean and spread towards the best half of the finished generation, then draw the next one.
+		scores = [self.get_fitness(c) for c in range(self.population)]
+		ranked = sorted(range(self.population), key=lambda c: -scores[c])
+		elite = ranked[:max(1, self.population // 2)]
+		# Better candidates count for more, with weights falling off with the log of their rank.
+		weights = [math.log(len(elite) + 0.5) - math.log(i + 1) for i in range(len(elite))]
+		total = sum(weights)
+		weights = [weight / total for weight in weights]
+		for i in range(len(self.params)):
+			mean = sum(weight * self.candidates[c][i] for weight, c in zip(weights, elite))
+			spread = math.sqrt(sum(weight * (self.candidates[c][i] - self.mean[i]) ** 2 for weight, c in zip(weights, elite)))
+			self.mean[i] += self.smoothing * (mean - self.mean[i])
+			self.sigma[i] += self.smoothing * (spread - self.sigma[i])
+			self.sigma[i] = max(self.sigma[i], self.min_sigma * max(abs(self.mean[i]), 0.1))
+		top = ranked[0]
+		if self.best is None or scores[top] > self.best[1]:
+			self.best = (dict(zip(self.params, self.candidates[top])), scores[top])
+		self.history.append((sum(scores) / len(scores), scores[top]))
+		self.generation += 1
+		self.new_generation()
+
+	def run (self, generations, workers=None, checkpoint=None, interval=30., report=print):
+		# Tune until the given number of generations have finished, on a pool of worker processes, one per core unless told otherwise.
+		# The state is saved to the checkpoint file, if there is one, at most every interval seconds and after every generation.
+		last_saved = time.perf_counter()
+		with ProcessPoolExecutor(workers) as pool:
+			while self.generation < generations:
+				start = time.perf_counter()
+				jobs = self.get_jobs()
+				futures = {pool.submit(play_game, *args): where for where, args in jobs}
+				frames = 0
+				placed = 0
+				for future in as_completed(futures):
+					c, g = futures[future]
+					self.results[c][g], game_frames, game_placed = future.result()
+					frames += game_frames
+					placed += game_placed
+					if checkpoint is not None and time.perf_counter() - last_saved >= interval:
+						self.save(checkpoint)
+						last_saved = time.perf_counter()
+				elapsed = time.perf_counter() - start
+				self.update()
+				if checkpoint is not None:
+					self.save(checkpoint)
+					last_saved = time.perf_counter()
+				mean, best = self.history[-1]
+				report("{}\n  fitness mean {:.1f}, best {:.1f}; {} games in {:.1f}s ({:.2f} games/sec, {:.0f} placements/sec)".format(
+					self, mean, best, len(jobs), elapsed, len(jobs) / elapsed if elapsed else 0., placed / elapsed if elapsed else 0.
+				))
+
+	def to_dict (self):
+		state = {name: getattr(self, name) for name in self.__slots__ if name != 'rng'}
+		state['rng'] = self.rng.getstate()
+		return state
+
+	def save (self, path):
+		# Write the state to a JSON file, replacing the old one only once it's all written.
+		with open(path + '.tmp', 'w') as cfile:
+			json.dump(self.to_dict(), cfile)
+		os.replace(path + '.tmp', path)
+
+	@classmethod
+	def load (cls, path):
+		# Carry on from a checkpoint file.
+		with open(path) as cfile:
+			state = json.load(cfile)
+		tuner = cls.__new__(cls)
+		for name in cls.__slots__:
+			if name != 'rng':
+				setattr(tuner, name, state[name])
+		# JSON turns the tuples in the generator's state into lists, which it won't take back.
+		version, internal, gauss = state['rng']
+		tuner.rng = random.Random()
+		tuner.rng.setstate((version, tuple(internal), gauss))
+		if tuner.best is not None:
+			tuner.best = tuple(tuner.best)
+		tuner.history = [tuple(entry) for entry in tuner.history]
+		return tuner
@@ -8,8 +8,8 @@ class User:
 	In this case, it tracks tetris difficulty values and handles score data.
 	"""
 	__slots__ = (
-		'state', 'gametype', 'resetgame', 'debug',
-		'cleartype', 'enablekicks', 'showghost', 'linktiles',
+		'state', 'gametype', 'resetgame', 'debug', 'demo',
+		'cleartype', 'enablekicks', 'rotsystem', 'showghost', 'showhint', 'linktiles', 'dirtyrects',
 		'hard_flag', 'twist_flag', 'tspin_flag',
 		'score', 'last_score', 'lines_cleared', 'level', 'timer',
 		'line_list', 'combo_ctr', 'current_combo'
@@ -30,17 +30,18 @@ class User:
 		self.state = 'main_menu'
 		self.gametype = 'free'
 		self.resetgame = False # True if the game needs to be reset.
+		self.demo = False # True if the bot is playing instead of the player.
 		# Eventually will be modifiable in the Options Menu.
 		# Default settings are good for Modern Tetris.
 		# Retro Tetris would use cleartype 0, enablekicks, showghost, and linktiles False.
 		self.cleartype = 2 # Determines line clear type, refer to Grid.clear_lines().
 		self.enablekicks = True # Determines if wall kicks are allowed.
+		self.rotsystem = 'arika' # Determines which wall kick table is used, refer to engine.kicks.
 		self.showghost = True # Determines if the ghost tetrimino will be shown.
+		self.showhint = False # Determines if the best placement the hint engine can find will be shown.
 		self.linktiles = True # Determines if the blocks will use connected textures.
+		self.dirtyrects = True # Determines if only the parts of the screen that changed are redrawn.
 
-		self.hard_flag = False # True if the piece was hard-dropped.
-		self.twist_flag = False # True if the tetrimino twisted into place.
-		self.tspin_flag = False # True if a T-spin occured.
 		self.eval_argv(None)
 		self.reset()
 
@@ -50,9 +51,10 @@ class User:
 			"User instance running <"+self.state+">.\n"
 			"User Settings:\n"
 			"Clear Type: "+(['Naive', 'Sticky Cascade', 'Linked Cascade'][self.cleartype])+"\n"
-			"Wall Kicks: "+('Enabled' if self.enablekicks else 'Disabled')+"; "
+			"Wall Kicks: "+('Enabled ('+self.rotsystem+')' if self.enablekicks else 'Disabled')+"; "
 			"Ghost Piece: "+('Enabled' if self.showghost else 'Disabled')+"; "
-			"Linked Tile Textures: "+('Enabled' if self.linktiles else 'Disabled')+"\n\n"
+			"Linked Tile Textures: "+('Enabled' if self.linktiles else 'Disabled')+"; "
+			"Dirty Rects: "+('Enabled' if self.dirtyrects else 'Disabled')+"\n\n"
 			"Scoring Values:\n"
 			"Score: "+str(self.score)+"; Last Clear: "+str(self.last_score)+" Clearing Chain: "+str(self.line_list[:-1])+"\n"
 			"Level: "+str(self.level)+"; Timer: "+"{}:{:02d}:{:02d}".format(self.timer // 60000, self.timer//1000 % 60, self.timer%1000 // 10)+"\n"
@@ -63,11 +65,19 @@ class User:
 		# argv is an argparse.Namespace object that defines special behavior for testing purposes.
 		if argv is not None:
 			self.debug = argv.debug # Debug mode: cheats on!
+			if argv.flip:
+				self.dirtyrects = False # Always redraw the whole screen, for displays that don't like partial updates.
+			if argv.hints:
+				self.showhint = True # Start out showing hints, which can be toggled in game with H.
 		else:
 			self.debug = False
 
 	def reset (self):
 		# Reset data when starting a new game.
+		self.hard_flag = False # True if the piece was hard-dropped.
+		self.twist_flag = False # True if the tetrimino twisted into place.
+		self.tspin_flag = False # True if a T-spin occured.
+
 		self.score = 0 # Score value for the current game.
 		self.last_score = 0 # Score value for the last clear.
 		self.line_list = [0] # Tracks how many lines are cleared in a single clearing chain.
@@ -89,17 +99,18 @@ class User:
 
 	def predict_score (self, clearflag):
 		# Evaluate clear line combo score value, but don't add it yet.
-		if self.line_list[-1] == 0:
-			self.line_list.pop()
+		# This gets shown while lines are still clearing, so it mustn't change anything itself.
+		# The chain ends in a 0 for a cascade that hasn't cleared anything (yet), which doesn't count.
+		line_list = self.line_list[:-1] if len(self.line_list) > 1 and self.line_list[-1] == 0 else self.line_list
 		temp_score = 0
 		# In arcade mode, level boosts score earned by line clears.
 		linescore = self.line_score
 		if self.gametype == 'arcade':
 			linescore += self.level*2.5
 		# Calculate base score from number of cascades and number of lines cleared per cascade.
-		for line in self.line_list:
+		for line in line_list:
 			temp_score += linescore * line * (1 + (self.line_factor * (line-1)))
-		temp_score *= (self.cascade_factor ** (len(self.line_list)-1)) * self.current_combo
+		temp_score *= (self.cascade_factor ** (len(line_list)-1)) * self.current_combo
 		# Increase score for twists.
 		if self.twist_flag:
 			temp_score *= self.twist_factor
@@ -141,6 +152,18 @@ class User:
 			self.level = 192 + ((self.lines_cleared - 3840) // 40)
 		else: self.level = 256
 
+	def set_level (self, level):
+		# Skip ahead to an arcade level by counting the lines it takes to get there as cleared.
+		if level <= 64:
+			self.lines_cleared = (level - 1) * 10
+		elif level <= 128:
+			self.lines_cleared = 640 + (level - 64) * 20
+		elif level <= 192:
+			self.lines_cleared = 1920 + (level - 128) * 30
+		else:
+			self.lines_cleared = 3840 + (min(level, 256) - 192) * 40
+		self.eval_level()
+
 	def eval_timer (self, time):
 		# Evaluate timer.
 		if self.gametype == 'timed':
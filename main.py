@@ -11,6 +11,13 @@ if __name__ == '__main__':
 	# Parse the optional arguments for the command line interface.
 	parser = argparse.ArgumentParser(description="Tetris clone implemented using Pygame.")
 	parser.add_argument('-d', '--debug', action='store_true', help="enables debug mode")
+	parser.add_argument('-f', '--flip', action='store_true', help="redraws the whole screen every frame")
+	parser.add_argument('-r', '--record', action='store_true', help="saves a replay of every game to the replays folder")
+	parser.add_argument('-p', '--play', metavar='REPLAY', default=None, help="plays back a replay file")
+	parser.add_argument('-u', '--uncapped', action='store_true', help="plays replays back as fast as possible")
+	parser.add_argument('--fps', type=int, default=60, help="most frames drawn per second, or 0 for no limit")
+	parser.add_argument('--hints', action='store_true', help="shows where the best placement is, toggled in game with H")
+	parser.add_argument('--demo', choices=('arcade', 'timed', 'free'), default=None, help="lets the bot play a game of this type")
 	# Run the game.
 	tetris = engine.game.init(parser.parse_args())
 	tetris.run()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"Runs pyTetris games headlessly as fast as possible and reports how fast that is."
+
+if __name__ == '__main__':
+	import os
+	import time
+	import random
+	import argparse
+	# Nothing gets drawn or played, so don't bother opening a window or an audio device.
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	import engine.headless as headless
+	from engine.bot import Bot
+	from engine.replay import Replay
+	# Parse the optional arguments for the command line interface.
+	parser = argparse.ArgumentParser(description="Headless pyTetris simulator.")
+	parser.add_argument('-m', '--mode', choices=('arcade', 'timed', 'free'), default='free', help="game mode to simulate")
+	parser.add_argument('-g', '--games', type=int, default=1, help="number of games to simulate")
+	parser.add_argument('-f', '--frames', type=int, default=None, help="maximum number of frames per game")
+	parser.add_argument('-s', '--seed', type=int, default=None, help="random seed for the inputs and pieces")
+	parser.add_argument('-i', '--input', choices=('idle', 'random', 'bot'), default='random', help="input stream fed to the games")
+	parser.add_argument('-l', '--level', type=int, default=1, help="level arcade games start at")
+	parser.add_argument('-r', '--replay', metavar='REPLAY', default=None, help="plays back a replay file instead")
+	args = parser.parse_args()
+
+	if args.replay is not None:
+		# Play back a single recorded game as fast as possible.
+		replay = Replay.load(args.replay)
+		sim = headless.Simulation()
+		start = time.perf_counter()
+		frames = sim.play(replay, args.frames)
+		elapsed = time.perf_counter() - start
+		print("{}: {} of {} frames, score {}, {} lines".format(replay, frames, len(replay), sim.user.score, sim.user.lines_cleared))
+		print("Played back in {:.2f}s ({:.0f} frames/sec)".format(elapsed, frames / elapsed if elapsed else 0))
+	else:
+		random.seed(args.seed)
+		rng = random.Random(args.seed)
+		sim = headless.Simulation()
+		bot = Bot(sim) if args.input == 'bot' else None
+		total_frames = 0
+		start = time.perf_counter()
+		for g in range(args.games):
+			sim.new_game(args.mode, level=args.level)
+			if bot is not None:
+				bot.reset()
+				inputs = bot.inputs()
+			elif args.input == 'idle':
+				inputs = headless.idle_input()
+			else:
+				inputs = headless.random_input(rng)
+			frames = sim.run(inputs, args.frames)
+			total_frames += frames
+			print("Game {}: {} frames, score {}, {} lines, ending with the stack {} high with {} holes".format(
+				g + 1, frames, sim.user.score, sim.user.lines_cleared, sim.grid.get_stack_height(), sim.grid.holes
+			))
+		elapsed = time.perf_counter() - start
+		print("{} frames in {:.2f}s ({:.0f} frames/sec)".format(total_frames, elapsed, total_frames / elapsed if elapsed else 0))
+		if bot is not None:
+			print(bot)
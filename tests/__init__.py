@@ -0,0 +1,5 @@
+"Tests for pyTetris, run from the top folder with python -m unittest or pytest."
+import os
+# Nothing needs a window or an audio device, so the tests run anywhere.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
@@ -0,0 +1,26 @@
+"Tests for the bot."
+import random
+import unittest
+import engine.headless as headless
+from engine.bot import Bot
+
+class LongCascadeGameTest (unittest.TestCase):
+	"""
+	The bot plays sticky and cascade clears out on a scratch grid, which scores them on a scratch user.
+	That user's combo was never broken, so it grew with every clear the bot tried until the score overflowed.
+	Seed 5 did that 18316 frames into the third game in cascade mode.
+	"""
+	def test_bot_plays_long_cascade_games (self):
+		random.seed(5)
+		sim = headless.Simulation()
+		sim.user.cleartype = 2
+		bot = Bot(sim)
+		for game in range(3):
+			sim.new_game('free')
+			bot.reset()
+			self.assertEqual(sim.run(bot.inputs(), 20000), 20000)
+			self.assertEqual(sim.user.state, 'game')
+			self.assertLessEqual(bot.scratch.user.combo_ctr, 1)
+
+if __name__ == '__main__':
+	unittest.main()
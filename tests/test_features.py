@@ -0,0 +1,36 @@
+"Tests for the board features the bot judges placements by."
+import random
+import unittest
+import engine.kicks as kicks
+import engine.features as features
+import engine.placements as placements
+import engine.headless as headless
+from engine.bot import Bot
+from engine.benchmarks import holey_boards
+
+@unittest.skipIf(features.np is None, "NumPy isn't installed.")
+class BatchFeaturesTest (unittest.TestCase):
+	def test_batch_matches_reference (self):
+		packed = features.from_boards(holey_boards(random.Random(0), 64))
+		self.assertEqual(features.check(packed), [ ])
+
+	def test_bot_ranks_the_same_either_way (self):
+		# The bot works boards out one at a time below its batch size, so both ways have to agree.
+		sim = headless.Simulation()
+		sim.user.cleartype = 0
+		bot = Bot(sim)
+		table = kicks.tables[sim.user.rotsystem]
+		for board in holey_boards(random.Random(1), 8):
+			for form in range(7):
+				found = placements.find_placements(board, form, table)
+				batched = bot.rank(found, board)
+				original = Bot.min_batch
+				try:
+					Bot.min_batch = len(found) + 1
+					scalar = bot.rank(found, board)
+				finally:
+					Bot.min_batch = original
+				self.assertEqual([(value, placement) for value, placement, outcome in batched], [(value, placement) for value, placement, outcome in scalar])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,53 @@
+"Tests for the headless simulation."
+import random
+import unittest
+import engine.headless as headless
+from engine.shapes import Shape, pieces
+
+class LockAboveGridTest (unittest.TestCase):
+	"""
+	A piece kicked partly above the grid used to be pasted there when it locked, indexing past the
+	top of the grid and failing the collision check assertion. Seed 11 with random input does that on frame 1176.
+	"""
+	def test_locking_above_the_grid_is_a_loss (self):
+		for cleartype in range(3):
+			sim = headless.Simulation()
+			sim.user.cleartype = cleartype
+			sim.new_game('free', 11)
+			sim.run(headless.random_input(random.Random(11)), 1200)
+			self.assertEqual(sim.user.state, 'loss_menu')
+			self.assertEqual(sim.frame, 1177)
+
+	def test_random_games_finish (self):
+		# A handful of random games in every mode and clear type should all run without tripping anything.
+		sim = headless.Simulation()
+		for seed in range(4):
+			for gametype in ('arcade', 'timed', 'free'):
+				for cleartype in range(3):
+					sim.user.cleartype = cleartype
+					sim.new_game(gametype, seed)
+					sim.run(headless.random_input(random.Random(seed)), 2000)
+
+class HoldIntoBlockedSpawnTest (unittest.TestCase):
+	"""
+	A held piece swapped back in comes in where pieces spawn, so it can be blocked there just like a new one.
+	That went unchecked, leaving the piece overlapping the stack until locking it failed the paste assertion.
+	"""
+	def test_holding_into_the_stack_is_a_loss (self):
+		sim = headless.Simulation()
+		sim.new_game('free', 0)
+		while not sim.entry_flag:
+			sim.step()
+		form = (sim.freeshape.form + 1) % 7
+		sim.storedshape = pieces[form]
+		# Fill in the cells the held piece comes in on, but none of the ones the active piece is in.
+		active = [list(pos) for pos in sim.freeshape.poslist]
+		for x, y in Shape(form).poslist:
+			if y >= 0 and [x, y] not in active:
+				sim.grid.place(y, x, sim.grid.new_block([x, y], 7))
+		sim.hold_shape()
+		self.assertEqual(sim.freeshape.form, form)
+		self.assertEqual(sim.user.state, 'loss_menu')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,93 @@
+"Tests for the hint engine."
+import time
+import random
+import unittest
+import engine.kicks as kicks
+import engine.placements as placements
+import engine.headless as headless
+from engine.bot import Bot
+from engine.hints import HintEngine
+
+class HintEngineTest (unittest.TestCase):
+	def setUp (self):
+		# A game a few pieces in, with a piece in play.
+		self.sim = headless.Simulation()
+		self.sim.new_game('free', 2)
+		self.sim.run(headless.random_input(random.Random(2)), 400)
+		while not self.sim.entry_flag:
+			self.sim.step()
+		self.hints = HintEngine(budget=0.1)
+
+	def tearDown (self):
+		self.hints.stop()
+
+	def wait (self, key):
+		# The result of the search of the snapshot with the given key, once it's found one.
+		start = time.perf_counter()
+		while self.hints.result is None or self.hints.result[0] != key:
+			self.assertLess(time.perf_counter() - start, 5.)
+			time.sleep(0.001)
+		return self.hints.result[1]
+
+	def test_moving_the_piece_starts_a_new_search (self):
+		sim = self.sim
+		key = self.hints.submit(sim)
+		self.assertEqual(self.hints.submit(sim), key)
+		sim.freeshape.translate((0, 1))
+		moved = self.hints.submit(sim)
+		self.assertNotEqual(moved, key)
+		sim.user.level += 1
+		self.assertNotEqual(self.hints.submit(sim), moved)
+
+	def test_hint_is_reachable (self):
+		# Whatever gets shown can be reached from where the piece is, or comes from holding it.
+		sim = self.sim
+		form, state, x, y = self.wait(self.hints.submit(sim))
+		shape = sim.freeshape
+		found = sim.get_placements()
+		if form == shape.form:
+			self.assertIn((state, x, y), [(placement.state, placement.x, placement.y) for placement in found])
+		else:
+			table = kicks.tables[sim.user.rotsystem] if sim.user.enablekicks else None
+			board = placements.Board.from_grid(sim.grid)
+			self.assertIn((state, x, y), [(placement.state, placement.x, placement.y) for placement in placements.find_placements(board, form, table)])
+
+	def test_worker_survives_a_failed_search (self):
+		search = HintEngine.search
+		def fail (engine, snapshot):
+			raise ValueError("Search failed on purpose.")
+		HintEngine.search = fail
+		try:
+			self.hints.submit(self.sim)
+			start = time.perf_counter()
+			while not self.hints.errors:
+				self.assertLess(time.perf_counter() - start, 5.)
+				time.sleep(0.001)
+		finally:
+			HintEngine.search = search
+		self.assertTrue(self.hints.thread.is_alive())
+		# The next snapshot gets searched like nothing happened.
+		self.sim.freeshape.translate((0, 1))
+		self.wait(self.hints.submit(self.sim))
+		self.assertEqual(self.hints.errors, 1)
+
+	def test_long_cascade_game (self):
+		# A bot plays a long cascade game with hints searched for every piece, which used to kill the worker.
+		sim = self.sim
+		sim.user.cleartype = 2
+		sim.new_game('free', 3)
+		bot = Bot(sim)
+		for event in bot.inputs():
+			if sim.frame >= 5000 or sim.user.state != 'game':
+				break
+			# Snapshots are only taken with a piece in play, like Core.eval_hint() does.
+			if sim.entry_flag and not sim.clearing:
+				# Let every search find something, so it gets to play out clears like it would in the window.
+				self.wait(self.hints.submit(sim))
+			sim.step(event)
+		self.assertEqual(sim.frame, 5000)
+		self.assertTrue(self.hints.thread.is_alive())
+		self.assertEqual(self.hints.errors, 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,42 @@
+"Tests for recording and playing back replays."
+import os
+import random
+import tempfile
+import unittest
+import engine.headless as headless
+from engine.replay import Replay
+
+class ReplayTest (unittest.TestCase):
+	def record (self, gametype, seed, level):
+		# Play a random game with a replay being recorded, returning the replay and how the game went.
+		sim = headless.Simulation()
+		sim.record = True
+		sim.new_game(gametype, seed, level)
+		sim.run(headless.random_input(random.Random(seed)), 1500)
+		replay = sim.replay
+		# Don't let the replay get saved to the replays folder.
+		sim.replay = None
+		return replay, (sim.frame, sim.user.score, sim.user.lines_cleared, sim.user.level, sim.grid.hash)
+
+	def play_back (self, replay):
+		sim = headless.Simulation()
+		sim.play(replay)
+		return sim.frame, sim.user.score, sim.user.lines_cleared, sim.user.level, sim.grid.hash
+
+	def test_later_level_round_trip (self):
+		# Arcade games started at a later level have garbage coming in, which only plays back right at that level.
+		replay, result = self.record('arcade', 3, 64)
+		self.assertEqual(replay.level, 64)
+		with tempfile.TemporaryDirectory() as folder:
+			path = replay.save(os.path.join(folder, 'game.rpl'))
+			loaded = Replay.load(path)
+		self.assertEqual(loaded.level, 64)
+		self.assertEqual(self.play_back(loaded), result)
+
+	def test_level_one (self):
+		replay, result = self.record('free', 5, 1)
+		self.assertEqual(replay.level, 1)
+		self.assertEqual(self.play_back(replay), result)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,75 @@
+"Tests for the grid."
+import unittest
+import pygame as pg
+from engine.shapes import Grid
+from engine.userstate import User
+
+def make_grid (cleartype, layout):
+	# A grid with the given rows of '.' and 'x' filled in at the bottom.
+	user = User()
+	user.cleartype = cleartype
+	grid = Grid(user)
+	for i, row in enumerate(layout, 22 - len(layout)):
+		for j, cell in enumerate(row):
+			if cell != '.':
+				grid.place(i, j, grid.new_block([j, i], 1))
+	return grid
+
+class ClearLinesTest (unittest.TestCase):
+	def test_naive_clears_yield_once_per_row (self):
+		# Every row of a naive clear gets its own turn of the clear animation, lowest first.
+		grid = make_grid(0, ['x' * 10, 'xxxx.xxxxx', 'x' * 10, 'x' * 10])
+		clearer = grid.clear_lines()
+		bottoms = [ ]
+		while next(clearer):
+			self.assertEqual(len(grid.csprts), 1)
+			bottoms.append(grid.csprts[0].rect.bottom)
+			grid.csprts = [ ]
+		self.assertEqual(grid.user.line_list, [3])
+		# The rows flash where they'd be once the ones below them were gone, so the two at the bottom flash in the same place.
+		self.assertEqual(bottoms[0], bottoms[1])
+		self.assertEqual(bottoms[2], bottoms[0] - 25)
+		self.assertEqual(grid.rows[21], 0b1111101111)
+
+class CascadeGarbageTest (unittest.TestCase):
+	"""
+	Garbage can come in while a cascade is still being shown falling, pushing the whole grid up a row.
+	The stack surface kept up as the fall goes on has to end up just like one drawn from scratch.
+	"""
+	def assert_positions (self, grid):
+		# Every block on the grid knows which cell it's in.
+		for i, row in enumerate(grid.cells):
+			for j, block in enumerate(row):
+				if block is not None:
+					self.assertEqual(block.relpos, [j, i])
+
+	def assert_fresh_stack (self, grid):
+		# The cached stack surface looks the same as one with every row drawn again.
+		grid.update()
+		cached = pg.image.tostring(grid.stack, 'RGB')
+		grid.stale_rows = set(range(2, 22))
+		grid.draw_stack()
+		self.assertEqual(cached, pg.image.tostring(grid.stack, 'RGB'))
+
+	def test_garbage_during_a_fall (self):
+		grid = make_grid(1, ['.xx.......', '.xx.......', 'x' * 10, 'x.........'])
+		grid.update()
+		clearer = grid.clear_lines()
+		# The clear, then the first row of the fall.
+		next(clearer)
+		grid.csprts = [ ]
+		next(clearer)
+		self.assertTrue(grid.falls)
+		grid.add_garbage()
+		self.assert_positions(grid)
+		self.assert_fresh_stack(grid)
+		while next(clearer):
+			grid.csprts = [ ]
+			grid.add_garbage()
+			self.assert_positions(grid)
+			self.assert_fresh_stack(grid)
+		self.assertFalse(grid.falls)
+		self.assert_fresh_stack(grid)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,69 @@
+"Tests for the transposition table's eviction, depth checks and counters."
+import unittest
+from engine.transpositions import TranspositionTable
+
+class TranspositionTableTest (unittest.TestCase):
+
+	def test_lru_evicts_least_recently_used (self):
+		table = TranspositionTable(capacity=3)
+		for key in 'abc':
+			table.store(key, key.upper())
+		# Using a makes b the least recently used.
+		self.assertEqual(table.get('a'), 'A')
+		table.store('d', 'D')
+		self.assertEqual(list(table.entries), ['c', 'a', 'd'])
+		self.assertEqual(table.evictions, 1)
+
+	def test_window_evicts_shallowest (self):
+		table = TranspositionTable(capacity=4, window=2)
+		for key, depth in zip('abcd', (2, 0, 1, 0)):
+			table.store(key, key.upper(), depth)
+		# b is the shallower of the two least recently used, even though a is older.
+		table.store('e', 'E', 3)
+		self.assertEqual(list(table.entries), ['a', 'c', 'd', 'e'])
+		# d is just as shallow but outside the window, so c goes before it.
+		table.store('f', 'F', 3)
+		self.assertEqual(list(table.entries), ['a', 'd', 'e', 'f'])
+
+	def test_used_stays_within_capacity (self):
+		table = TranspositionTable(capacity=10, window=2)
+		for i in range(100):
+			table.store(i, i, i % 3, i % 4 + 1)
+			self.assertLessEqual(table.used, table.capacity)
+			self.assertEqual(table.used, sum(entry[2] for entry in table.entries.values()))
+		# Entries that could never fit aren't stored at all.
+		table.store('big', 'big', cost=11)
+		self.assertNotIn('big', table)
+		self.assertLessEqual(table.used, table.capacity)
+
+	def test_deeper_entry_is_kept (self):
+		table = TranspositionTable()
+		table.store('a', 'deep', 2)
+		table.store('a', 'shallow', 1)
+		self.assertEqual(table.get('a'), 'deep')
+		# A shallower search can't use it, but one at least as deep can.
+		self.assertIsNone(table.get('a', 3))
+		self.assertEqual(table.get('a', 2), 'deep')
+		table.store('a', 'deeper', 3)
+		self.assertEqual(table.get('a', 3), 'deeper')
+
+	def test_counters (self):
+		table = TranspositionTable(capacity=2)
+		table.store('a', 1, 1)
+		table.store('b', 2)
+		table.get('a')
+		table.get('a', 2)
+		table.get('c')
+		self.assertNotIn('c', table)
+		table.store('c', 3)
+		self.assertEqual((table.hits, table.misses, table.evictions), (1, 2, 1))
+		self.assertAlmostEqual(table.get_hit_rate(), 1 / 3)
+		# Clearing keeps the counts, resetting them doesn't.
+		table.clear()
+		self.assertEqual((len(table), table.used, table.hits), (0, 0, 1))
+		table.reset_counters()
+		self.assertEqual((table.hits, table.misses, table.evictions), (0, 0, 0))
+		self.assertEqual(table.get_hit_rate(), 0.)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"Tunes the bot's weights and the scoring constants on headless games spread over every core."
+
+if __name__ == '__main__':
+	import os
+	import argparse
+	# Nothing gets drawn or played, so don't bother opening a window or an audio device.
+	# Worker processes inherit these too.
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	# SDL would otherwise catch Ctrl-C and turn it into a quit event nobody reads, leaving no way to stop a long run.
+	os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+	import engine.tuning as tuning
+	from engine.bot import features
+	# Parse the optional arguments for the command line interface.
+	parser = argparse.ArgumentParser(description="pyTetris bot and scoring tuner.")
+	parser.add_argument('params', nargs='*', default=list(features), help="bot weights and scoring constants to tune, all the weights by default")
+	parser.add_argument('-m', '--mode', choices=('arcade', 'timed', 'free'), default='free', help="game mode to tune on")
+	parser.add_argument('-g', '--games', type=int, default=4, help="games every candidate plays each generation")
+	parser.add_argument('-f', '--frames', type=int, default=6000, help="maximum number of frames per game")
+	parser.add_argument('-l', '--level', type=int, default=1, help="level arcade games start at")
+	parser.add_argument('-n', '--population', type=int, default=16, help="candidates each generation")
+	parser.add_argument('-G', '--generations', type=int, default=10, help="number of generations to stop after, counting ones from a checkpoint")
+	parser.add_argument('-F', '--fitness', choices=tuning.fitnesses, default='lines', help="what games are judged by")
+	parser.add_argument('-S', '--sigma', type=float, default=0.3, help="starting spread of each parameter, relative to its value")
+	parser.add_argument('-s', '--seed', type=int, default=None, help="random seed for the candidates and games")
+	parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes, one per core by default")
+	parser.add_argument('-c', '--checkpoint', metavar='FILE', default='tuning.json', help="file the state is saved to and carried on from")
+	args = parser.parse_args()
+
+	if os.path.exists(args.checkpoint):
+		# Carry on where the last run left off, with the settings it was started with.
+		tuner = tuning.Tuner.load(args.checkpoint)
+		print("Carrying on from " + args.checkpoint + " (delete it to start over).")
+	else:
+		tuner = tuning.Tuner(
+			args.params, args.mode, args.games, args.frames, args.level, args.fitness, args.population, args.sigma, args.seed
+		)
+	print(tuner)
+	tuner.run(args.generations, args.workers, args.checkpoint)
+	if tuner.best is not None:
+		params, fitness = tuner.best
+		print("Best so far, with a fitness of {:.1f}:".format(fitness))
+		for name, value in params.items():
+			print("  {}: {:.4f}".format(name, value))